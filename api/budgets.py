@@ -0,0 +1,16 @@
+# Har bir endpoint uchun ruxsat etilgan SQL so'rovlar soni. Sahifadagi yozuvlar
+# soniga bog'liq bo'lmasligi kerak: oshib ketsa, bu N+1 qaytganini bildiradi.
+# Savol serializeri javoblar va xonalar (M2M) uchun har biri bittadan prefetch so'rovi qo'shadi.
+# GroupEditor.get: keshlangan javob berilishidan oldin egalik tekshiruvi (IsRoomOwner) xona
+# yozuvini tests.rooms orqali o'qiydi, u sovuq keshda bitta so'rov (iliq keshda 0).
+# api/tests.py ularni assertNumQueries bilan, bench_api esa katta ma'lumotlarda tekshiradi.
+QUERY_BUDGETS = {
+    "GroupAdd.get": 2,
+    "GroupEditor.get": 5,
+    "AddQuestion.get": 4,
+    "AddExistingQuestions.get": 4,
+    "EditQuestion.get": 3,
+    "Question.get": 4,
+    "ResultApi.get": 1,
+    "CategoryApi.get": 1,
+}
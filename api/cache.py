@@ -0,0 +1,67 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.response import Response
+
+from tests.cache import CATEGORY_TAG, group_tag, invalidate, question_tag, tag_versions
+from tests.models import Answer, Category, Group, Questions
+
+
+def cached_response(request, name: str, tags, build):
+    """Teglar versiyasi bilan keshlangan javob; ETag ham shu versiyalardan olinadi.
+
+    If-None-Match mos kelsa tana umuman o'qilmaydi, 304 qaytadi.
+    """
+    key = f"content:{name}:" + ":".join(str(version) for version in tag_versions(tags))
+    etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, getattr(settings, "CONTENT_CACHE_TTL", 3600))
+    return Response(data, headers={"ETag": etag})
+
+
+def _question_group_tags(question_id):
+    codes = Group.objects.filter(questions__id=question_id).values_list("code", flat=True)
+    return [group_tag(code) for code in codes]
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate(CATEGORY_TAG)
+
+
+@receiver(post_save, sender=Questions)
+def question_saved(sender, instance, **kwargs):
+    invalidate(question_tag(instance.id), *_question_group_tags(instance.id))
+
+
+@receiver(pre_delete, sender=Questions)
+def question_deleted(sender, instance, **kwargs):
+    # post_delete da M2M bog'lanishlar allaqachon o'chgan bo'ladi
+    invalidate(question_tag(instance.id), *_question_group_tags(instance.id))
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    invalidate(question_tag(instance.question_id), *_question_group_tags(instance.question_id))
+
+
+@receiver(m2m_changed, sender=Questions.group.through)
+def question_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # instance: Group, pk_set: savollar
+        question_ids = pk_set if pk_set is not None else instance.questions.values_list("id", flat=True)
+        invalidate(group_tag(instance.code), *(question_tag(question_id) for question_id in question_ids))
+    else:
+        # instance: Questions, pk_set: xonalar
+        groups = Group.objects.filter(id__in=pk_set) if pk_set is not None else instance.group.all()
+        invalidate(question_tag(instance.id), *(group_tag(code) for code in groups.values_list("code", flat=True)))
@@ -0,0 +1,109 @@
+import csv
+import json
+from itertools import groupby, islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, OuterRef, Subquery
+from django.http import StreamingHttpResponse
+
+from tests.models import Result, UserAnswers
+
+CHUNK_SIZE = 2000
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+
+class _Echo:
+    """csv.writer uchun bufer: yozilgan qatorni saqlamasdan qaytaradi."""
+
+    def write(self, value):
+        return value
+
+
+def result_rows(group, question_ids):
+    """Har bir o'quvchi uchun bitta qator: o'rin, umumiy ball va savollar bo'yicha (to'g'ri, ball).
+
+    Barcha javoblar bitta so'rovda (server-side cursor) o'quvchilar bo'yicha tartiblab o'qiladi,
+    shuning uchun xotira javoblar soniga emas, bitta o'quvchining javoblariga bog'liq.
+    """
+    result = Result.objects.filter(group=group, user=OuterRef("user"))
+    answers = (
+        UserAnswers.objects.filter(group=group)
+        .annotate(rank=Subquery(result.values("rank")[:1]), total=Subquery(result.values("score")[:1]))
+        .order_by(F("rank").asc(nulls_last=True), "user_id")
+        .values_list("user_id", "user__username", "rank", "total", "question_id", "is_correct", "score")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for _, rows in groupby(answers, key=lambda row: row[0]):
+        rows = list(rows)
+        by_question = {row[4]: (row[5], row[6]) for row in rows}
+        _, username, rank, total, *_ = rows[0]
+        if total is None:
+            total = sum(score for _, score in by_question.values())
+        yield rank, username, total, [by_question.get(question_id, (None, None)) for question_id in question_ids]
+
+
+def answer_rows(group):
+    return (
+        UserAnswers.objects.filter(group=group)
+        .order_by("user_id", "question_id")
+        .values_list("user__username", "question_id", "question__question", "answer__answer",
+                     "is_correct", "score", "created_at")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+ANSWER_COLUMNS = ["username", "question_id", "question", "answer", "is_correct", "score", "created_at"]
+
+
+def results_csv(group, question_ids):
+    writer = csv.writer(_Echo())
+    header = ["rank", "username", "score"]
+    for number in range(1, len(question_ids) + 1):
+        header += [f"q{number}_correct", f"q{number}_score"]
+    yield writer.writerow(header)
+    for rank, username, total, answers in result_rows(group, question_ids):
+        yield writer.writerow([rank, username, total, *(value for answer in answers for value in answer)])
+
+
+def results_jsonl(group, question_ids):
+    for rank, username, total, answers in result_rows(group, question_ids):
+        yield json.dumps({
+            "rank": rank,
+            "username": username,
+            "score": total,
+            "answers": [
+                {"question_id": question_id, "is_correct": is_correct, "score": score}
+                for question_id, (is_correct, score) in zip(question_ids, answers)
+            ],
+        }, ensure_ascii=False) + "\n"
+
+
+def answers_csv(group):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ANSWER_COLUMNS)
+    for row in answer_rows(group):
+        yield writer.writerow(row)
+
+
+def answers_jsonl(group):
+    for row in answer_rows(group):
+        yield json.dumps(dict(zip(ANSWER_COLUMNS, row)), ensure_ascii=False, default=str) + "\n"
+
+
+async def _chunks(lines, size=500):
+    # Sinxron DB iteratori har doim bitta thread da (thread_sensitive) bo'laklab o'qiladi
+    lines = iter(lines)
+    take = sync_to_async(lambda: "".join(islice(lines, size)))
+    while chunk := await take():
+        yield chunk
+
+
+def stream_response(request, lines, filename, kind):
+    """ASGI (daphne) ostida async iterator beradi: aks holda Django sinxron generatorni
+    to'liq ro'yxatga yig'ib, xotirani javoblar soniga bog'lab qo'yadi."""
+    if isinstance(request, ASGIRequest):
+        lines = _chunks(lines)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[kind])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{kind}"'
+    return response
@@ -0,0 +1,139 @@
+import csv
+import json
+
+from django.db import transaction
+
+from tests.cache import group_tag, invalidate
+from tests.counters import shift_total_questions
+from tests.models import Answer, Category, Questions
+from .serializer import QuestionImportSerializer
+
+CHUNK_SIZE = 500
+# Javobda ko'rsatiladigan xatolar soni (qolganlari faqat sanaladi)
+MAX_REPORTED_ERRORS = 1000
+NOT_UTF8 = "Qator UTF-8 kodlashda emas. Faylni UTF-8 (CSV UTF-8) formatida saqlang."
+
+
+class RowError(ValueError):
+    """Qatorni o'qib bo'lmadi. fatal=True: fayl davomini ham o'qib bo'lmaydi (masalan, CSV oqimi buzilgan)."""
+
+    def __init__(self, message, fatal=False):
+        super().__init__(message)
+        self.fatal = fatal
+
+
+def _lines(upload):
+    # UploadedFile qatorma-qator o'qiladi, fayl xotiraga to'liq yuklanmaydi
+    for line in upload:
+        yield line.decode("utf-8-sig")
+
+
+def _normalize(data):
+    # CSV va JSONL bir xil qoidalar bilan tekshiriladi
+    if isinstance(data, dict) and isinstance(data.get("level"), str):
+        data["level"] = data["level"].strip().upper()
+    return data
+
+
+def iter_csv(upload):
+    """CSV ustunlari: question, level, category, answer1..answer4, correct (to'g'ri javob raqami 1-4)."""
+    reader = csv.DictReader(_lines(upload))
+    try:
+        for number, row in enumerate(reader, start=2):
+            correct = (row.get("correct") or "").strip()
+            answers = [
+                {"answer": row[f"answer{i}"], "is_correct": correct == str(i)}
+                for i in range(1, 5)
+                if row.get(f"answer{i}")
+            ]
+            yield number, _normalize({
+                "question": row.get("question"),
+                "level": row.get("level") or "",
+                "category": (row.get("category") or "").strip(),
+                "answers": answers,
+            })
+    except UnicodeDecodeError:
+        # Qator o'qilguncha line_num oshmaydi: xato keyingi qatorda
+        yield reader.line_num + 1, RowError(NOT_UTF8, fatal=True)
+    except csv.Error as exc:
+        yield reader.line_num, RowError(f"CSV o‘qilmadi: {exc}", fatal=True)
+
+
+def iter_jsonl(upload):
+    """Har bir qator: {"question", "level", "category", "answers": [{"answer", "is_correct"}, ...]}."""
+    for number, raw in enumerate(upload, start=1):
+        try:
+            line = raw.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            yield number, RowError(NOT_UTF8)
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+            continue
+        yield number, _normalize(data)
+
+
+def import_questions(rows, user, group=None, chunk_size=CHUNK_SIZE):
+    """Qatorlarni tekshirib, to'plamlab bulk_create qiladi va har bir qator bo'yicha hisobot qaytaradi.
+
+    Har bir to'plam alohida tranzaksiyada yoziladi: savollar, javoblar va xona bog'lanishlari
+    uchun bittadan INSERT. Xato qatorlar o'tkazib yuboriladi va hisobotda qaytariladi.
+    """
+    categories = dict(Category.objects.values_list("name", "id"))
+    report = {"created": 0, "error_count": 0, "errors": []}
+    chunk = []
+
+    def add_error(number, errors):
+        report["error_count"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": number, "errors": errors})
+
+    for number, data in rows:
+        if isinstance(data, RowError):
+            add_error(number, {"non_field_errors": [str(data)]})
+            if data.fatal:
+                break
+            continue
+        if isinstance(data, Exception) or not isinstance(data, dict):
+            add_error(number, {"non_field_errors": ["Qator JSON obyekt emas."]})
+            continue
+        serializer = QuestionImportSerializer(data=data)
+        if not serializer.is_valid():
+            add_error(number, serializer.errors)
+            continue
+        row = serializer.validated_data
+        category_id = categories.get(row["category"])
+        if category_id is None:
+            add_error(number, {"category": [f"'{row['category']}' kategoriyasi topilmadi."]})
+            continue
+        chunk.append((row, category_id))
+        if len(chunk) >= chunk_size:
+            report["created"] += _save_chunk(chunk, user, group)
+            chunk = []
+    if chunk:
+        report["created"] += _save_chunk(chunk, user, group)
+    return report
+
+
+@transaction.atomic
+def _save_chunk(chunk, user, group):
+    questions = Questions.objects.bulk_create([
+        Questions(question=row["question"], level=row["level"], created_by=user, category_id=category_id)
+        for row, category_id in chunk
+    ])
+    Answer.objects.bulk_create([
+        Answer(question=question, answer=answer["answer"], is_correct=answer["is_correct"])
+        for question, (row, _) in zip(questions, chunk)
+        for answer in row["answers"]
+    ])
+    if group is not None:
+        through = Questions.group.through
+        through.objects.bulk_create([through(questions_id=question.id, group_id=group.id) for question in questions])
+        # bulk_create signal yubormaydi
+        shift_total_questions({group.id: len(questions)})
+        invalidate(group_tag(group.code))
+    return len(questions)
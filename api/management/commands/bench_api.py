@@ -0,0 +1,182 @@
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.budgets import QUERY_BUDGETS
+from tests import rooms
+from tests.models import User, Category, Group, Questions, Answer, UserAnswers, Result
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "REST API endpointlarini realistik hajmdagi ma'lumotlarda o'lchaydi va har biri uchun "
+        "SQL so'rovlar byudjetini tekshiradi. Ma'lumotlar tranzaksiya ichida yaratilib, oxirida bekor qilinadi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=2000)
+        parser.add_argument("--groups", type=int, default=200)
+        parser.add_argument("--questions-per-group", type=int, default=50)
+        parser.add_argument("--students", type=int, default=500)
+        parser.add_argument("--answers", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--json", dest="json_path", help="Natijani JSON faylga yozish (trendlar uchun)")
+        parser.add_argument("--no-fail", action="store_true", help="Byudjet oshsa ham xato bilan tugatmaslik")
+
+    def handle(self, *args, **options):
+        self.options = options
+        allowed_hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        # Umumiy (Redis) kesh ishlatilmaydi: bekor qilinadigan ma'lumotlar jonli teg versiyalari bilan
+        # keshda qolmasin va o'lchovlar har safar sovuq keshdan boshlansin
+        private_cache = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                     "LOCATION": "bench_api"}}
+        try:
+            with override_settings(ALLOWED_HOSTS=allowed_hosts, CACHES=private_cache), transaction.atomic():
+                self.seed()
+                report = self.measure()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.print_report(report)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        over_budget = [name for name, row in report["endpoints"].items() if not row["within_budget"]]
+        if over_budget and not options["no_fail"]:
+            raise CommandError(f"So'rovlar byudjeti oshdi: {', '.join(over_budget)}")
+
+    def seed(self):
+        options = self.options
+        rnd = random.Random(42)
+        self.teacher = User.objects.create(username="bench_api_teacher", is_admin=True, password="!")
+        categories = Category.objects.bulk_create([Category(name=f"Kategoriya {i}") for i in range(20)])
+        levels = ["LOW", "MEDIUM", "HIGH"]
+
+        questions = Questions.objects.bulk_create([
+            Questions(
+                question=f"Savol {i}: {rnd.choice(['Python', 'Django', 'SQL', 'Tarix', 'Fizika'])} bo'yicha",
+                level=levels[i % 3],
+                created_by=self.teacher,
+                category=categories[i % len(categories)],
+            )
+            for i in range(options["questions"])
+        ], batch_size=1000)
+        answers = Answer.objects.bulk_create([
+            Answer(question=q, answer=f"Javob {j}", is_correct=(j == 0)) for q in questions for j in range(4)
+        ], batch_size=2000)
+        correct = {a.question_id: a for a in answers if a.is_correct}
+
+        groups = Group.objects.bulk_create([
+            Group(name=f"Xona {i}", admin=self.teacher, code=f"bench{i}", time=20, is_used=True)
+            for i in range(options["groups"])
+        ], batch_size=1000)
+        through = Questions.group.through
+        group_questions = {}
+        links = []
+        for group in groups:
+            picked = rnd.sample(questions, min(options["questions_per_group"], len(questions)))
+            group_questions[group.id] = picked
+            links.extend(through(questions_id=q.id, group_id=group.id) for q in picked)
+        through.objects.bulk_create(links, batch_size=5000)
+
+        students = User.objects.bulk_create([
+            User(username=f"bench_api_s{i}", password="!") for i in range(options["students"])
+        ], batch_size=1000)
+        rows = []
+        per_group = max(1, options["answers"] // max(1, len(groups)))
+        for group in groups:
+            for k in range(per_group):
+                question = group_questions[group.id][k % len(group_questions[group.id])]
+                student = students[(k // len(group_questions[group.id])) % len(students)]
+                rows.append(UserAnswers(
+                    user=student, group=group, question=question, answer=correct[question.id],
+                    is_correct=True, score=rnd.randint(0, 1500),
+                ))
+        UserAnswers.objects.bulk_create(rows, batch_size=5000, ignore_conflicts=True)
+
+        self.student = students[0]
+        Result.objects.bulk_create([
+            Result(user=self.student, group=group, score=rnd.randint(0, 15000), rank=rnd.randint(1, 100))
+            for group in groups
+        ], batch_size=1000)
+
+        self.group = groups[0]
+        self.question = group_questions[self.group.id][0]
+        # AddQuestion / AddExistingQuestions faqat o'qituvchi yaratgan va shu xonadagi savollarni ko'rsatadi
+        self.category = self.question.category_id
+
+    def endpoints(self):
+        code = self.group.code
+        return [
+            ("GroupAdd.get", self.teacher, "/questions/rooms/"),
+            ("GroupEditor.get", self.teacher, f"/questions/rooms/{code}/"),
+            ("AddQuestion.get", self.teacher, f"/questions/rooms/{code}/questions/"),
+            ("AddExistingQuestions.get", self.teacher, f"/questions/rooms/{code}/addexist/"),
+            ("EditQuestion.get", self.teacher, f"/questions/rooms/{code}/questions/{self.question.id}/"),
+            ("Question.get", self.teacher, f"/questions/add/?category={self.category}"),
+            ("ResultApi.get", self.student, "/questions/myresult/"),
+            ("CategoryApi.get", self.teacher, "/questions/category/add/"),
+        ]
+
+    def measure(self):
+        results = {}
+        for name, user, url in self.endpoints():
+            client = APIClient()
+            client.force_authenticate(user)
+            counter = _QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{name}: {url} -> {response.status_code}")
+            timings = []
+            for _ in range(self.options["repeat"]):
+                # Har bir o'lchov sovuq keshdan: aks holda kesh urilishi o'lchanadi
+                cache.clear()
+                rooms._local.clear()
+                started = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            budget = QUERY_BUDGETS.get(name)
+            results[name] = {
+                "url": url,
+                "queries": counter.count,
+                "budget": budget,
+                "within_budget": budget is None or counter.count <= budget,
+                "p50_ms": round(statistics.median(timings), 2),
+                "max_ms": round(max(timings), 2),
+                "response_bytes": len(response.content),
+            }
+        return {"dataset": {k: self.options[k] for k in ("questions", "groups", "students", "answers")},
+                "endpoints": results}
+
+    def print_report(self, report):
+        self.stdout.write(f"{'endpoint':<26} {'queries':>8} {'budget':>7} {'p50 ms':>9} {'max ms':>9} {'bytes':>9}")
+        for name, row in report["endpoints"].items():
+            flag = "" if row["within_budget"] else "  <-- byudjetdan oshdi"
+            self.stdout.write(
+                f"{name:<26} {row['queries']:>8} {row['budget'] or '-':>7} {row['p50_ms']:>9} "
+                f"{row['max_ms']:>9} {row['response_bytes']:>9}{flag}"
+            )
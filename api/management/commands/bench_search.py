@@ -0,0 +1,119 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.search import search_questions
+from tests.models import User, Category, Questions
+
+WORDS = [
+    "python", "django", "sql", "tarix", "fizika", "kimyo", "matematika", "algebra", "geometriya",
+    "adabiyot", "biologiya", "geografiya", "informatika", "funksiya", "tenglama", "massiv", "ro'yxat",
+    "lug'at", "sikl", "shart", "o'zgaruvchi", "klass", "obyekt", "meros", "qonun", "energiya", "atom",
+    "hujayra", "davlat", "poytaxt", "daryo", "tog'", "asr", "yozuvchi", "she'r", "roman", "kasr",
+    "ildiz", "kvadrat", "uchburchak", "burchak", "tezlik", "kuch", "massa", "zanjir", "indeks",
+]
+PAGE_SIZE = 10
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Savollar bankidagi qidiruvni (api.search) eski icontains filtri bilan solishtiradi. "
+        "Har bir hajm uchun ma'lumotlar tranzaksiya ichida yaratilib, oxirida bekor qilinadi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--explain", action="store_true", help="Postgres so'rov rejalarini chiqarish")
+        parser.add_argument("--json", dest="json_path", help="Natijani JSON faylga yozish (trendlar uchun)")
+
+    def handle(self, *args, **options):
+        self.options = options
+        report = {"vendor": connection.vendor, "sizes": {}}
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    self.seed(size)
+                    report["sizes"][size] = self.measure()
+                    raise _Rollback
+            except _Rollback:
+                pass
+            self.print_report(size, report["sizes"][size])
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(report, f, indent=2)
+
+    def seed(self, size):
+        rnd = random.Random(size)
+        self.teacher = User.objects.create(username=f"bench_search_{size}", is_admin=True, password="!")
+        self.categories = Category.objects.bulk_create([Category(name=f"Kategoriya {i}") for i in range(50)])
+        levels = ["LOW", "MEDIUM", "HIGH"]
+        batch = []
+        for i in range(size):
+            # Savollar 100 belgidan oshmaydi (Questions.question max_length)
+            text = " ".join(rnd.choices(WORDS, k=rnd.randint(3, 8)))[:90]
+            batch.append(Questions(
+                question=f"{text} {i}", level=levels[i % 3],
+                created_by=self.teacher, category=self.categories[i % len(self.categories)],
+            ))
+            if len(batch) == 10_000:
+                Questions.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Questions.objects.bulk_create(batch)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Questions._meta.db_table}")
+
+    def cases(self):
+        return [
+            ("tez-uchraydigan so'z", "python", {}),
+            ("kam uchraydigan so'z", "uchburchak tezlik", {}),
+            ("so'z boshi", "geomet", {}),
+            ("kategoriya + daraja", "energiya", {"category": self.categories[7], "level": "HIGH"}),
+        ]
+
+    def measure(self):
+        results = {}
+        base = Questions.objects.filter(created_by=self.teacher).order_by("id")
+        for name, term, filters in self.cases():
+            questions = base.filter(**filters)
+            legacy = questions.filter(question__icontains=term)
+            searched = search_questions(questions, term)
+            results[name] = {
+                "term": term,
+                "legacy_icontains": self.time_page(legacy),
+                "search": self.time_page(searched),
+            }
+            if self.options["explain"] and connection.vendor == "postgresql":
+                self.stdout.write(f"--- {name}: {term}\n{searched[:PAGE_SIZE].explain(analyze=True)}")
+        return results
+
+    def time_page(self, queryset):
+        """Sahifalashdagidek: umumiy son va birinchi sahifa."""
+        timings = []
+        for _ in range(self.options["repeat"]):
+            started = time.perf_counter()
+            count = queryset.count()
+            list(queryset[:PAGE_SIZE])
+            timings.append((time.perf_counter() - started) * 1000)
+        return {"matches": count, "p50_ms": round(statistics.median(timings), 2),
+                "max_ms": round(max(timings), 2)}
+
+    def print_report(self, size, results):
+        self.stdout.write(f"questions={size} vendor={connection.vendor}")
+        self.stdout.write(f"  {'holat':<22} {'term':<18} {'matches':>8} {'icontains p50':>14} {'search p50':>11}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"  {name:<22} {row['term']:<18} {row['search']['matches']:>8} "
+                f"{row['legacy_icontains']['p50_ms']:>14} {row['search']['p50_ms']:>11}"
+            )
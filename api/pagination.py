@@ -0,0 +1,91 @@
+import json
+from functools import partial
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator as DjangoPaginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+COUNT_EXACT = "exact"
+COUNT_ESTIMATE = "estimate"
+COUNT_NONE = "none"
+
+
+def estimate_count(queryset):
+    """Postgres rejalashtiruvchisining taxminiy qator soni (COUNT(*) siz). Boshqa bazalarda None."""
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class LookaheadPaginator(DjangoPaginator):
+    """COUNT(*) ishlatmaydigan paginator: keyingi sahifa borligini bitta ortiqcha qator bilan aniqlaydi."""
+
+    def __init__(self, object_list, per_page, count_mode=COUNT_NONE, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_mode = count_mode
+
+    @cached_property
+    def count(self):
+        if self.count_mode == COUNT_ESTIMATE:
+            return estimate_count(self.object_list)
+        return None
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Sahifa raqami butun son emas")
+        if number < 1:
+            raise EmptyPage("Sahifa raqami 1 dan kichik")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage("Bu sahifada natija yo'q")
+        # Page.has_next() num_pages ga qaraydi: uni COUNT siz, ortiqcha qator bo'yicha belgilaymiz
+        self.num_pages = number + 1 if len(rows) > self.per_page else number
+        return self._get_page(rows[:self.per_page], number, self)
+
+
+class PageNumberCountPagination(PageNumberPagination):
+    """Sahifa raqami bo'yicha pagination, ?count=exact|estimate|none bilan.
+
+    estimate — Postgres da rejalashtiruvchi bahosi (boshqa bazalarda aniq son),
+    none — umumiy son hisoblanmaydi (count: null). Ikkalasida ham COUNT(*) bajarilmaydi.
+    """
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count_mode = request.query_params.get(self.count_query_param, COUNT_EXACT)
+        if count_mode == COUNT_ESTIMATE and connections[queryset.db].vendor != "postgresql":
+            count_mode = COUNT_EXACT
+        if count_mode in (COUNT_ESTIMATE, COUNT_NONE):
+            self.django_paginator_class = partial(LookaheadPaginator, count_mode=count_mode)
+            if request.query_params.get(self.page_query_param) in self.last_page_strings:
+                raise NotFound(self.invalid_page_message)
+        return super().paginate_queryset(queryset, request, view=view)
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor (keyset) pagination: WHERE id > ... LIMIT, shuning uchun chuqurlikdan qat'i nazar bir xil tez."""
+
+    def __init__(self, ordering="id"):
+        self.ordering = ordering
+
+
+def get_pagination(request, ordering="id"):
+    """?pagination=cursor (yoki ?cursor=...) bo'lsa keyset, aks holda sahifa raqami bo'yicha pagination.
+
+    Cursor rejimida natijalar `ordering` (indekslangan ustun) bo'yicha tartiblanadi,
+    qidiruv reytingi bo'yicha emas.
+    """
+    params = request.query_params
+    if params.get("pagination") == "cursor" or "cursor" in params:
+        return KeysetPagination(ordering)
+    return PageNumberCountPagination()
@@ -3,4 +3,5 @@ from rest_framework.permissions import BasePermission
 class IsRoomOwner(BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.admin == request.user
+        # obj: Group yoki tests.rooms.Room (keshlangan xona)
+        return obj.admin_id == request.user.id
@@ -0,0 +1,53 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _prefix_query(words):
+    # "pyth djan" -> "pyth:* & djan:*": har bir so'z boshlanishi bo'yicha qidiriladi
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def search_questions(questions, term: str):
+    """Savollar bankida qidiruv: mos kelganlar reyting bo'yicha (eng mosi birinchi) qaytadi.
+
+    Postgres da to'liq matnli qidiruv (so'z boshi bo'yicha) va pg_trgm bilan qism-satr
+    qidiruvi ishlatiladi; ikkalasi ham tests/migrations/0011 dagi GIN indekslarga tayanadi.
+    Boshqa bazalarda (SQLite) oddiy icontains ga qaytiladi.
+    """
+    term = term.strip()
+    if not term:
+        return questions
+    words = WORD_RE.findall(term.lower())
+    if connections[questions.db].vendor == "postgresql":
+        return _search_postgres(questions, term, words)
+    return _search_fallback(questions, term, words)
+
+
+def _search_postgres(questions, term, words):
+    vector = SearchVector("question", config="simple")
+    rank = TrigramSimilarity("question", term)
+    matches = Q(question__icontains=term)
+    if words:
+        query = SearchQuery(_prefix_query(words), config="simple", search_type="raw")
+        questions = questions.alias(search_vector=vector)
+        matches |= Q(search_vector=query)
+        rank = SearchRank(vector, query) + rank
+    return questions.filter(matches).annotate(search_rank=rank).order_by("-search_rank", "id")
+
+
+def _search_fallback(questions, term, words):
+    matches = Q(question__icontains=term)
+    if words:
+        matches |= Q(*[Q(question__icontains=word) for word in words])
+    rank = Case(
+        When(question__istartswith=term, then=Value(2)),
+        When(question__icontains=term, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return questions.filter(matches).annotate(search_rank=rank).order_by("-search_rank", "id")
@@ -1,6 +1,14 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from tests.models import *
+from tests.rooms import generate_code, group_status
 from accounts.models import CustomUser
+def validate_answers(answers):
+    if len(answers) != 4:
+        raise serializers.ValidationError({"answers": "Har bir savolda aniq 4ta javob bo‘lishi kerak."})
+    true_count = sum(1 for ans in answers if ans.get('is_correct') == True)
+    if true_count != 1:
+        raise serializers.ValidationError({"answers": "Har bir savolda faqat bitta javob to'g'ri bo'lishi kerak."})
 class AnswersSerializer(serializers.ModelSerializer):
     class Meta:
         model = Answer
@@ -43,12 +51,7 @@ class QuestionsSerializer(serializers.ModelSerializer):
         return question
 
     def validate(self, data):
-        answers = data.get('answers', [])
-        if len(answers) != 4:
-            raise serializers.ValidationError({"answers": "Har bir savolda aniq 4ta javob bo‘lishi kerak."})
-        true_count = sum(1 for ans in answers if ans.get('is_correct') == True)
-        if true_count != 1:
-            raise serializers.ValidationError({"answers": "Har bir savolda faqat bitta javob to'g'ri bo'lishi kerak."})
+        validate_answers(data.get('answers', []))
         return data
     def update(self, instance, validated_data):
         request = self.context.get('request')
@@ -62,12 +65,48 @@ class QuestionsSerializer(serializers.ModelSerializer):
         for answer_data in answers_data:
             Answer.objects.create(question=instance, **answer_data)
         return instance
+class QuestionImportSerializer(serializers.Serializer):
+    """Import faylidagi bitta qator. Kategoriya nomi bilan beriladi, bazaga murojaat qilinmaydi."""
+    question = serializers.CharField(max_length=100)
+    level = serializers.ChoiceField(choices=list(level))
+    category = serializers.CharField(max_length=100)
+    answers = AnswersSerializer(many=True)
+
+    def validate(self, data):
+        validate_answers(data.get('answers', []))
+        return data
 class GroupSerializer(serializers.ModelSerializer):
     questions = QuestionsSerializer(many=True, read_only=True)
     class Meta:
         model = Group
         fields = '__all__'
-        read_only_fields = ('id', 'admin', 'start_time', "end_time", "is_used")
+        read_only_fields = ('id', 'admin', 'start_time', "end_time", "is_used", "total_questions", "participant_count")
+        extra_kwargs = {'code': {'required': False}}
+
+    def create(self, validated_data):
+        if validated_data.get('code'):
+            return super().create(validated_data)
+        # Kod berilmasa generatsiya qilinadi; kamdan-kam to'qnashuvni unique indeks ushlaydi
+        for _ in range(5):
+            validated_data['code'] = generate_code()
+            try:
+                with transaction.atomic():
+                    return super().create(validated_data)
+            except IntegrityError:
+                continue
+        raise serializers.ValidationError({"code": "Xona kodini yaratib bo‘lmadi, qayta urinib ko‘ring."})
+class GroupListSerializer(serializers.ModelSerializer):
+    """Xonalar ro'yxati uchun yengil ko'rinish: savollar o'rniga faqat ularning soni."""
+    question_count = serializers.IntegerField(source='total_questions', read_only=True)
+    status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Group
+        fields = ('id', 'name', 'description', 'code', 'time', 'start_time', 'end_time',
+                  'is_active', 'is_used', 'question_count', 'participant_count', 'status')
+
+    def get_status(self, obj):
+        return group_status(obj)
 class ResultSerializer(serializers.Serializer):
     score = serializers.FloatField()
     rank = serializers.IntegerField()
@@ -1,3 +1,270 @@
-from django.test import TestCase
+import json
+import os
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from tests import rooms
+from tests.models import User, Category, Group, GroupUsers, Questions, Answer, UserAnswers, QuestionStat, Result
+from .budgets import QUERY_BUDGETS
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ROOM_STATE_REDIS_URL="",
+)
+class QueryBudgetTests(TestCase):
+    """Sahifadan ko'p yozuv bilan har bir endpoint sovuq keshda byudjetdagi so'rovlar sonini bajaradi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="budget_teacher", is_admin=True, password="!")
+        cls.student = User.objects.create(username="budget_student", password="!")
+        cls.category = Category.objects.create(name="Kategoriya")
+        groups = [
+            Group.objects.create(name=f"Xona {i}", admin=cls.teacher, code=f"BUDGET{i}", time=20, is_used=True)
+            for i in range(12)
+        ]
+        cls.group = groups[0]
+        questions = []
+        for i in range(25):
+            question = Questions.objects.create(
+                question=f"Savol {i}", level="LOW", created_by=cls.teacher, category=cls.category,
+            )
+            question.group.add(*groups[:3])
+            Answer.objects.bulk_create([
+                Answer(question=question, answer=f"Javob {j}", is_correct=(j == 0)) for j in range(4)
+            ])
+            questions.append(question)
+        cls.question = questions[0]
+        UserAnswers.objects.bulk_create([
+            UserAnswers(user=cls.student, group=cls.group, question=q, answer=q.answers.first(),
+                        is_correct=True, score=100)
+            for q in questions
+        ])
+        Result.objects.bulk_create([
+            Result(user=cls.student, group=group, score=100, rank=1) for group in groups
+        ])
+
+    def setUp(self):
+        cache.clear()
+        rooms._local.clear()
+
+    def endpoints(self):
+        code = self.group.code
+        return [
+            ("GroupAdd.get", self.teacher, "/questions/rooms/"),
+            ("GroupEditor.get", self.teacher, f"/questions/rooms/{code}/"),
+            ("AddQuestion.get", self.teacher, f"/questions/rooms/{code}/questions/"),
+            ("AddExistingQuestions.get", self.teacher, f"/questions/rooms/{code}/addexist/"),
+            ("EditQuestion.get", self.teacher, f"/questions/rooms/{code}/questions/{self.question.id}/"),
+            ("Question.get", self.teacher, f"/questions/add/?category={self.category.id}"),
+            ("ResultApi.get", self.student, "/questions/myresult/"),
+            ("CategoryApi.get", self.teacher, "/questions/category/add/"),
+        ]
+
+    def test_query_budgets(self):
+        for name, user, url in self.endpoints():
+            with self.subTest(name):
+                client = APIClient()
+                client.force_authenticate(user)
+                with self.assertNumQueries(QUERY_BUDGETS[name]):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_editor_forbidden_for_other_users(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.get(f"/questions/rooms/{self.group.code}/").status_code, 403)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ROOM_STATE_REDIS_URL="",
+)
+class SharedQuestionTests(TestCase):
+    """Bir nechta xonadagi savol, ulardan birida test ketayotganda o'zgartirilmaydi."""
+
+    def setUp(self):
+        cache.clear()
+        rooms._local.clear()
+        self.teacher = User.objects.create(username="shared_teacher", is_admin=True, password="!")
+        self.running = Group.objects.create(name="A", admin=self.teacher, code="SHAREDA", time=20, is_active=True)
+        self.idle = Group.objects.create(name="B", admin=self.teacher, code="SHAREDB", time=20)
+        category = Category.objects.create(name="Kategoriya")
+        self.question = Questions.objects.create(
+            question="Savol", level="LOW", created_by=self.teacher, category=category,
+        )
+        self.question.group.add(self.running, self.idle)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def test_delete_through_other_room_is_rejected(self):
+        for room in (self.running, self.idle):
+            response = self.client.delete(f"/questions/rooms/{room.code}/questions/{self.question.id}/")
+            self.assertEqual(response.status_code, 409)
+        self.assertTrue(Questions.objects.filter(id=self.question.id).exists())
+
+    def test_edit_through_other_room_is_rejected(self):
+        response = self.client.put(
+            f"/questions/rooms/{self.idle.code}/questions/{self.question.id}/",
+            {"question": "Yangi", "level": "LOW"}, format="json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.question, "Savol")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ROOM_STATE_REDIS_URL="",
+)
+class QuestionImportTests(TestCase):
+    """Buzuq fayl 500 emas, qatorlar bo'yicha hisobot bilan 400 qaytaradi."""
+
+    HEADER = "question,level,category,answer1,answer2,answer3,answer4,correct\n"
+
+    def setUp(self):
+        self.teacher = User.objects.create(username="import_teacher", is_admin=True, password="!")
+        Category.objects.create(name="Tarix")
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def upload(self, name, content):
+        return self.client.post("/questions/add/import/", {"file": SimpleUploadedFile(name, content)}, format="multipart")
+
+    def test_non_utf8_csv_is_reported(self):
+        content = (self.HEADER + "Birinchi,LOW,Tarix,a,b,c,d,1\nТарих савол,LOW,Tarix,a,b,c,d,1\n").encode("cp1251")
+        response = self.upload("savollar.csv", content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 3)
+        self.assertIn("UTF-8", response.data["errors"][0]["errors"]["non_field_errors"][0])
+
+        response = self.upload("savollar.csv", (self.HEADER + "Тарих,LOW,Tarix,a,b,c,d,1\n").encode("cp1251"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error_count"], 1)
+
+    def test_non_utf8_jsonl_line_is_skipped(self):
+        good = json.dumps({
+            "question": "Savol", "level": " low ", "category": "Tarix",
+            "answers": [{"answer": str(i), "is_correct": i == 0} for i in range(4)],
+        })
+        content = good.encode() + b"\n" + '{"question": "Тарих"}\n'.encode("cp1251") + good.encode() + b"\n"
+        response = self.upload("savollar.jsonl", content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2])
+        self.assertEqual(set(Questions.objects.values_list("level", flat=True)), {"LOW"})
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ROOM_STATE_REDIS_URL="",
+)
+class QuestionBankTests(TestCase):
+    """Eksport, pagination, qidiruv, ETag va hisoblagichlarni qayta hisoblash."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="bank_teacher", is_admin=True, password="!")
+        cls.students = [User.objects.create(username=f"bank_student{i}", password="!") for i in range(2)]
+        cls.category = Category.objects.create(name="Kategoriya")
+        cls.group = Group.objects.create(name="Xona", admin=cls.teacher, code="BANK", time=20, is_used=True)
+        cls.questions = []
+        for i in range(25):
+            question = Questions.objects.create(
+                question=f"Savol {i}", level="LOW", created_by=cls.teacher, category=cls.category,
+            )
+            Answer.objects.bulk_create([
+                Answer(question=question, answer=f"Javob {j}", is_correct=(j == 0)) for j in range(4)
+            ])
+            cls.questions.append(question)
+        cls.asked = cls.questions[:2]
+        for question in cls.asked:
+            question.group.add(cls.group)
+        for user, score in zip(cls.students, (100, 0)):
+            UserAnswers.objects.bulk_create([
+                UserAnswers(user=user, group=cls.group, question=question,
+                            answer=question.answers.first() if score else None,
+                            is_correct=bool(score), score=score)
+                for question in cls.asked
+            ])
+        Result.objects.create(user=cls.students[0], group=cls.group, score=200, rank=1)
+        Result.objects.create(user=cls.students[1], group=cls.group, score=0, rank=2)
+
+    def setUp(self):
+        cache.clear()
+        rooms._local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def test_results_export_csv(self):
+        response = self.client.get(f"/questions/rooms/{self.group.code}/export/results/")
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [
+            "rank,username,score,q1_correct,q1_score,q2_correct,q2_score",
+            "1,bank_student0,200,True,100,True,100",
+            "2,bank_student1,0,False,0,False,0",
+        ])
+
+    def test_page_without_count(self):
+        first = self.client.get("/questions/add/?count=none").data
+        self.assertIsNone(first["count"])
+        self.assertIsNotNone(first["next"])
+        self.assertEqual([row["id"] for row in first["results"]], [q.id for q in self.questions[:10]])
+        last = self.client.get("/questions/add/?count=none&page=3").data
+        self.assertEqual(len(last["results"]), 5)
+        self.assertIsNone(last["next"])
+        self.assertEqual(self.client.get("/questions/add/?count=none&page=4").status_code, 404)
+
+    def test_cursor_pages_cover_all_rows(self):
+        ids, url = [], "/questions/add/?pagination=cursor"
+        while url:
+            data = self.client.get(url).data
+            ids += [row["id"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(ids, [q.id for q in self.questions])
+
+    def test_search(self):
+        for text in ("Qaysi shahar poytaxt?", "Poytaxt nima?"):
+            Questions.objects.create(question=text, level="LOW", created_by=self.teacher, category=self.category)
+        data = self.client.get("/questions/add/", {"question": "poytaxt"}).data
+        found = [row["question"] for row in data["results"]]
+        self.assertCountEqual(found, ["Qaysi shahar poytaxt?", "Poytaxt nima?"])
+        if connection.vendor != "postgresql":
+            # icontains fallback: matn boshida kelgani birinchi
+            self.assertEqual(found, ["Poytaxt nima?", "Qaysi shahar poytaxt?"])
+
+    def test_etag_changes_after_edit(self):
+        url = f"/questions/rooms/{self.group.code}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        question = self.asked[0]
+        question.question = "Yangi matn"
+        # Kesh versiyasi tranzaksiya commit bo'lgandan keyin yangilanadi
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Yangi matn", [row["question"] for row in response.data["questions"]])
+
+    def test_recompute_counters(self):
+        GroupUsers.objects.bulk_create([GroupUsers(group=self.group, user=user) for user in self.students])
+        Group.objects.filter(id=self.group.id).update(total_questions=99, participant_count=99)
+        QuestionStat.objects.filter(group=self.group).update(answered_count=99)
+        call_command("recompute_counters", self.group.code, stdout=open(os.devnull, "w"))
+
+        group = Group.objects.get(id=self.group.id)
+        self.assertEqual((group.total_questions, group.participant_count), (2, 2))
+        stats = dict(QuestionStat.objects.filter(group=self.group).values_list("question_id", "answered_count"))
+        # 0 ball (answer=None) qatorlari javob hisoblanmaydi
+        self.assertEqual(stats, {question.id: 1 for question in self.asked})
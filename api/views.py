@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
@@ -8,17 +9,30 @@ from .serializer import *
 from tests.models import *
 from accounts.models import *
 from .permission import *
-from rest_framework.pagination import PageNumberPagination
+from .search import search_questions
+from .importer import import_questions, iter_csv, iter_jsonl
+from .cache import cached_response
+from tests.cache import CATEGORY_TAG, group_tag, question_tag
+from tests.rooms import get_room_or_404
+from .export import answers_csv, answers_jsonl, results_csv, results_jsonl, stream_response
+from .pagination import get_pagination
+
+
+def with_question_details(questions):
+    """QuestionsSerializer uchun so'rov rejasi: sahifadagi savollar sonidan qat'i nazar doimiy so'rovlar."""
+    return questions.select_related('category', 'created_by').prefetch_related('answers', 'group')
+
+
 class GroupAdd(APIView):
     serializer_class = GroupSerializer
     permission_classes = [IsAuthenticated]
 
-    @extend_schema(responses=GroupSerializer(many=True))
+    @extend_schema(responses=GroupListSerializer(many=True))
     def get(self, request):
-        groups = Group.objects.filter(admin = request.user)
-        page = PageNumberPagination()
+        groups = Group.objects.filter(admin = request.user).order_by('-id')
+        page = get_pagination(request, ordering='-id')
         pagination = page.paginate_queryset(groups, request, view=self)
-        serializer = GroupSerializer(pagination, many=True, context={'request': request})
+        serializer = GroupListSerializer(pagination, many=True, context={'request': request})
         return page.get_paginated_response(serializer.data)
 
     @extend_schema(request=GroupSerializer, responses=GroupSerializer)
@@ -35,12 +49,20 @@ class GroupEditor(APIView):
 
     @extend_schema(responses=GroupSerializer)
     def get(self, request, group_code):
-        group = get_object_or_404(Group, code=group_code)
-        serializer = GroupSerializer(group)
-        return Response(serializer.data)
+        self.check_object_permissions(request, get_room_or_404(group_code))
+
+        def build():
+            questions = with_question_details(Questions.objects.order_by('id'))
+            group = get_object_or_404(
+                Group.objects.prefetch_related(Prefetch('questions', queryset=questions)), code=group_code
+            )
+            return GroupSerializer(group).data
+        return cached_response(request, f"group:{group_code}", [group_tag(group_code), CATEGORY_TAG], build)
     @extend_schema(request=GroupSerializer, responses=GroupSerializer)
     def patch(self, request, group_code):
-        group = get_object_or_404(Group, code=group_code)
+        room = get_room_or_404(group_code)
+        self.check_object_permissions(request, room)
+        group = get_object_or_404(Group, id=room.id)
         serializer = GroupSerializer(instance=group, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             serializer.save(admin=request.user)
@@ -49,8 +71,9 @@ class GroupEditor(APIView):
 
     @extend_schema(responses={204: None})
     def delete(self, request, group_code):
-        group = get_object_or_404(Group, code=group_code)
-        group.delete()
+        room = get_room_or_404(group_code)
+        self.check_object_permissions(request, room)
+        get_object_or_404(Group, id=room.id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class AddQuestion(APIView):
@@ -59,18 +82,22 @@ class AddQuestion(APIView):
 
     @extend_schema(responses=QuestionsSerializer(many=True))
     def get(self, request, group_code):
-        questions = Questions.objects.filter(group__code=group_code, created_by = request.user)
-        page = PageNumberPagination()
+        questions = with_question_details(
+            Questions.objects.filter(group__code=group_code, created_by = request.user).order_by('id')
+        )
+        page = get_pagination(request)
         pagination = page.paginate_queryset(questions, request, view=self)
         serializer = QuestionsSerializer(pagination, many=True, context={'request': request})
         return page.get_paginated_response(serializer.data)
 
     @extend_schema(request=QuestionsSerializer, responses=QuestionsSerializer)
     def post(self, request, group_code):
-        group = get_object_or_404(Group, code=group_code)
-        if group.admin != request.user:
+        room = get_room_or_404(group_code)
+        if room.admin_id != request.user.id:
             return Response({"detail": "Faqat xona egasi savol qo‘shishi mumkin."}, status=status.HTTP_403_FORBIDDEN)
-        serializer = QuestionsSerializer(data=request.data, context={'request': request, 'group': group})
+        if room.is_active:
+            return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
+        serializer = QuestionsSerializer(data=request.data, context={'request': request, 'group': room.id})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -81,44 +108,50 @@ class AddExistingQuestions(APIView):
 
     @extend_schema(request=QuestionsSerializer(many=True))
     def get(self, request, group_code):
-        questions = Questions.objects.filter(created_by=request.user, group__code=group_code)
+        questions = with_question_details(
+            Questions.objects.filter(created_by=request.user, group__code=group_code).order_by('id')
+        )
         if request.GET.get("category"):
             questions = questions.filter(category_id=request.GET.get("category"))
         if request.GET.get("level"):
             questions = questions.filter(level=request.GET.get("level"))
         if request.GET.get("question"):
-            questions = questions.filter(question__icontains=request.GET.get("question "))
-        page = PageNumberPagination()
+            questions = search_questions(questions, request.GET.get("question"))
+        page = get_pagination(request)
         pagination = page.paginate_queryset(questions, request, view=self)
         serializer = QuestionsSerializer(pagination, many=True, context={'request': request})
         return page.get_paginated_response(serializer.data)
 
     @extend_schema(request=QuestionsSerializer, responses=QuestionsSerializer)
     def post(self, request, group_code):
-        group = get_object_or_404(Group, code=group_code)
-        if group.admin != request.user:
+        room = get_room_or_404(group_code)
+        if room.admin_id != request.user.id:
             return Response({"detail": "Faqat xona egasi test qo‘shishi mumkin."}, status=status.HTTP_403_FORBIDDEN)
+        if room.is_active:
+            return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
         question_ids = request.data.get('question_ids', [])
         if not question_ids:
             return Response({"detail": "Hech qanday test tanlanmagan"}, status=status.HTTP_400_BAD_REQUEST)
         questions = Questions.objects.filter(id__in=question_ids, created_by=request.user)
         for q in questions:
-            q.group.add(group)
+            q.group.add(room.id)
         return Response({"detail": f"{questions.count()} test qo‘shildi"}, status=status.HTTP_200_OK)
 
     @extend_schema(responses={204: None})
     def delete(self, request, group_code):
-        group = get_object_or_404(Group, code=group_code)
-        if group.admin != request.user:
+        room = get_room_or_404(group_code)
+        if room.admin_id != request.user.id:
             return Response({"detail": "Faqat xona egasi testlarni o‘chirishi mumkin."}, status=status.HTTP_403_FORBIDDEN)
+        if room.is_active:
+            return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
         question_ids = request.data.get('question_ids', [])
         if not question_ids:
             return Response({"detail": "Hech qanday test tanlanmagan"}, status=status.HTTP_400_BAD_REQUEST)
-        questions = Questions.objects.filter(id__in=question_ids, group=group)
+        questions = Questions.objects.filter(id__in=question_ids, group=room.id)
         if not questions.exists():
             return Response({"detail": "Tanlangan testlar groupda topilmadi"}, status=status.HTTP_404_NOT_FOUND)
         for q in questions:
-            q.group.remove(group)
+            q.group.remove(room.id)
         return Response({"detail": f"{questions.count()} test groupdan o‘chirildi"}, status=status.HTTP_200_OK)
 
 class EditQuestion(APIView):
@@ -127,16 +160,21 @@ class EditQuestion(APIView):
 
     @extend_schema(responses=QuestionsSerializer)
     def get(self, request, group_code, question_id):
-        question = get_object_or_404(Questions, id=question_id, group__code=group_code)
-        serializer = QuestionsSerializer(question)
-        return Response(serializer.data)
+        def build():
+            question = get_object_or_404(with_question_details(Questions.objects), id=question_id, group__code=group_code)
+            return QuestionsSerializer(question).data
+        tags = [question_tag(question_id), group_tag(group_code), CATEGORY_TAG]
+        return cached_response(request, f"question:{group_code}:{question_id}", tags, build)
 
     @extend_schema(request=QuestionsSerializer, responses=QuestionsSerializer)
     def put(self, request, group_code, question_id):
-        group = get_object_or_404(Group, code=group_code)
-        if group.admin != request.user:
+        room = get_room_or_404(group_code)
+        if room.admin_id != request.user.id:
             return Response({"detail": "Faqat xona egasi savol qo‘shishi mumkin."}, status=status.HTTP_403_FORBIDDEN)
-        question = get_object_or_404(Questions, id=question_id, group__code=group_code)
+        question = get_object_or_404(Questions, id=question_id, group=room.id)
+        # Savol boshqa xonalarda ham bo'lishi mumkin: ularning birortasida test ketayotgan bo'lsa ham o'zgartirilmaydi
+        if question.group.filter(is_active=True).exists():
+            return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
         serializer = QuestionsSerializer(instance=question, data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
@@ -145,35 +183,61 @@ class EditQuestion(APIView):
 
     @extend_schema(responses={204: None})
     def delete(self, request, group_code, question_id):
-        group = get_object_or_404(Group, code=group_code)
-        if group.admin != request.user:
+        room = get_room_or_404(group_code)
+        if room.admin_id != request.user.id:
             return Response({"detail": "Faqat xona egasi bu huquqqa ega"}, status=status.HTTP_403_FORBIDDEN)
-        question = get_object_or_404(Questions, id=question_id, group__code=group_code)
+        question = get_object_or_404(Questions, id=question_id, group=room.id)
+        if question.group.filter(is_active=True).exists():
+            return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
         question.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class GroupExport(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses={200: bytes})
+    def get(self, request, group_code, sheet):
+        room = get_room_or_404(group_code)
+        if room.admin_id != request.user.id:
+            return Response({"detail": "Faqat xona egasi natijalarni yuklab olishi mumkin."}, status=status.HTTP_403_FORBIDDEN)
+        kind = request.query_params.get('type', 'csv')
+        if sheet not in ('results', 'answers') or kind not in ('csv', 'jsonl'):
+            return Response({"detail": "Noto‘g‘ri eksport turi"}, status=status.HTTP_400_BAD_REQUEST)
+        if sheet == 'results':
+            question_ids = list(Questions.objects.filter(group=room.id).order_by('id').values_list('id', flat=True))
+            lines = results_csv(room.id, question_ids) if kind == 'csv' else results_jsonl(room.id, question_ids)
+        else:
+            lines = answers_csv(room.id) if kind == 'csv' else answers_jsonl(room.id)
+        return stream_response(request._request, lines, f"{room.code}_{sheet}", kind)
+
 class ResultApi(APIView):
     serializer_class = ResultSerializer
 
     @extend_schema(responses=ResultSerializer(many=True))
     def get(self, request):
-        results = Result.objects.filter(user=request.user)
-        serializer = ResultSerializer(results, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        results = Result.objects.filter(user=request.user).select_related('group').order_by('-id')
+        # Eski mijozlar uchun: pagination so'ralmasa to'liq ro'yxat qaytadi
+        if not {'page', 'cursor', 'pagination'} & set(request.query_params):
+            serializer = ResultSerializer(results, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        page = get_pagination(request, ordering='-id')
+        pagination = page.paginate_queryset(results, request, view=self)
+        serializer = ResultSerializer(pagination, many=True)
+        return page.get_paginated_response(serializer.data)
 
 class Question(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(responses=QuestionsSerializer(many=True))
     def get(self, request):
-        question = Questions.objects.filter(created_by=request.user)
+        question = with_question_details(Questions.objects.filter(created_by=request.user).order_by('id'))
         if request.GET.get("category"):
             question = question.filter(category_id=request.GET.get("category"))
         if request.GET.get("level"):
             question = question.filter(level=request.GET.get("level"))
         if request.GET.get("question"):
-            question = question.filter(question__icontains=request.GET.get("question"))
-        page = PageNumberPagination()
+            question = search_questions(question, request.GET.get("question"))
+        page = get_pagination(request)
         pagination = page.paginate_queryset(question, request, view=self)
         serializer = QuestionsSerializer(pagination, many=True, context={'request': request})
         return page.get_paginated_response(serializer.data)
@@ -187,12 +251,39 @@ class Question(APIView):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+class QuestionImport(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        request={'multipart/form-data': {'type': 'object', 'properties': {'file': {'type': 'string', 'format': 'binary'}}}},
+        responses={201: dict, 400: dict},
+    )
+    def post(self, request):
+        if not request.user.is_admin:
+            return Response({"detail": "Faqat admin savol qo‘shishi mumkin."}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Fayl yuborilmadi"}, status=status.HTTP_400_BAD_REQUEST)
+        group = None
+        if request.query_params.get('group'):
+            group = get_room_or_404(request.query_params['group'])
+            if group.admin_id != request.user.id:
+                return Response({"detail": "Faqat xona egasi savol qo‘shishi mumkin."}, status=status.HTTP_403_FORBIDDEN)
+            if group.is_active:
+                return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
+        if upload.name.lower().endswith(('.jsonl', '.ndjson')):
+            rows = iter_jsonl(upload)
+        else:
+            rows = iter_csv(upload)
+        report = import_questions(rows, request.user, group)
+        code = status.HTTP_201_CREATED if report["created"] else status.HTTP_400_BAD_REQUEST
+        return Response(report, status=code)
 class QuestionsEditor(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(responses=QuestionsSerializer)
     def get(self, request, question_id):
-        question = Questions.objects.get(id=question_id, created_by=request.user)
+        question = with_question_details(Questions.objects).get(id=question_id, created_by=request.user)
         serializer = QuestionsSerializer(question)
         return Response(serializer.data)
 
@@ -201,6 +292,8 @@ class QuestionsEditor(APIView):
         question = Questions.objects.get(id=question_id, created_by=request.user)
         if not request.user == question.created_by:
             return Response({"detail":"Savol egasi emassiz!"})
+        if question.group.filter(is_active=True).exists():
+            return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
 
         serializer = QuestionsSerializer(instance=question, data=request.data, context={'request': request})
         if serializer.is_valid():
@@ -213,6 +306,8 @@ class QuestionsEditor(APIView):
         question = Questions.objects.get(id=question_id, created_by=request.user)
         if not request.user == question.created_by:
             return Response({"detail":"Savol egasi emassiz!"})
+        if question.group.filter(is_active=True).exists():
+            return Response({"detail": "Test davom etmoqda, savollarni o‘zgartirib bo‘lmaydi."}, status=status.HTTP_409_CONFLICT)
         question.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 class CategoryApi(APIView):
@@ -220,9 +315,9 @@ class CategoryApi(APIView):
 
     @extend_schema(responses=CategorySerializer(many=True))
     def get(self, request):
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        def build():
+            return CategorySerializer(Category.objects.order_by('id'), many=True).data
+        return cached_response(request, "categories", [CATEGORY_TAG], build)
 
     @extend_schema(request=CategorySerializer, responses=CategorySerializer)
     def post(self, request):
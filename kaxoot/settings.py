@@ -138,21 +138,68 @@ TEMPLATES = [
 WSGI_APPLICATION = 'kaxoot.wsgi.application'
 ASGI_APPLICATION = "kaxoot.asgi.application"
 
+REDIS_HOST = config("REDIS_HOST", default="127.0.0.1")
+REDIS_PORT = config("REDIS_PORT", default=6379, cast=int)
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts": [(config("REDIS_HOST", default="127.0.0.1"),
-                       config("REDIS_PORT", default=6379))],
+            "hosts": [(REDIS_HOST, REDIS_PORT)],
         },
     },
 }
 
+# Xona holati (lease, reyting va h.k.) uchun Redis. Bo'sh qiymat berilsa
+# jarayon ichidagi (in-memory) variantlar ishlatiladi, masalan testlarda.
+ROOM_STATE_REDIS_URL = config("ROOM_STATE_REDIS_URL", default=f"redis://{REDIS_HOST}:{REDIS_PORT}/1")
+ROOM_ENGINE_LEASE_TTL = config("ROOM_ENGINE_LEASE_TTL", default=30, cast=int)
+LEADERBOARD_SIZE = config("LEADERBOARD_SIZE", default=100, cast=int)
+LEADERBOARD_BROADCAST_INTERVAL = config("LEADERBOARD_BROADCAST_INTERVAL", default=0.25, cast=float)
+
+# "buffered": javoblar xotirada baholanadi va to'plab (bulk_create) yoziladi;
+# jarayon yiqilsa oxirgi ANSWER_BUFFER_FLUSH_INTERVAL sekund / ANSWER_BUFFER_SIZE
+# tagacha javob yo'qolishi mumkin. "immediate": har bir javob darhol yoziladi.
+ANSWER_WRITE_MODE = config("ANSWER_WRITE_MODE", default="buffered")
+ANSWER_BUFFER_SIZE = config("ANSWER_BUFFER_SIZE", default=200, cast=int)
+ANSWER_BUFFER_FLUSH_INTERVAL = config("ANSWER_BUFFER_FLUSH_INTERVAL", default=1.0, cast=float)
+# Savol vaqti tugagandan keyin javob qabul qilinadigan qo'shimcha sekundlar; engine test
+# yakunida 0 ball yozishdan oldin ham shuncha kutadi
+ANSWER_GRACE_PERIOD = config("ANSWER_GRACE_PERIOD", default=1.0, cast=float)
+PRESENCE_BROADCAST_INTERVAL = config("PRESENCE_BROADCAST_INTERVAL", default=1.0, cast=float)
+
+# Savollar, xonalar va kategoriyalar ko'rinishlari uchun kesh. Bo'sh qiymat berilsa
+# jarayon ichidagi locmem kesh ishlatiladi (testlar uchun).
+CACHE_URL = config("CACHE_URL", default=f"redis://{REDIS_HOST}:{REDIS_PORT}/2")
+if CACHE_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+CONTENT_CACHE_TTL = config("CONTENT_CACHE_TTL", default=60 * 60, cast=int)
+# WebSocket ulanishida xona yozuvi jarayon ichida shuncha sekund saqlanadi
+ROOM_LOCAL_TTL = config("ROOM_LOCAL_TTL", default=2.0, cast=float)
+
+# PostgreSQL ulanishlari. DB_POOL=True: psycopg 3 pooli (daphne va async consumerlar uchun):
+# ulanish har so'rov/consumer chaqiruvida ochilmaydi, pool dan olinib qaytariladi, soni esa
+# har bir daphne jarayonida DB_POOL_MAX_SIZE bilan cheklanadi (jami: jarayonlar x max_size
+# < max_connections). Pool o'chirilsa DB_CONN_MAX_AGE sekundlik doimiy ulanishlar
+# ishlatiladi; async kodda ularning soni cheklanmaydi. pgbouncer (transaction pooling)
+# orqasida DB_PGBOUNCER=True: server-side cursor lar o'chiriladi.
+DB_POOL = config("DB_POOL", default=True, cast=bool)
 DATABASES = {
     'default': dj_database_url.parse(
-        config('DATABASE_URL', default='sqlite:///db.sqlite3')
+        config('DATABASE_URL', default='sqlite:///db.sqlite3'),
+        conn_max_age=0 if DB_POOL else config("DB_CONN_MAX_AGE", default=0, cast=int),
+        conn_health_checks=config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
+        disable_server_side_cursors=config("DB_PGBOUNCER", default=False, cast=bool),
     )
 }
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+        "max_size": config("DB_POOL_MAX_SIZE", default=20, cast=int),
+        "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),
+    }
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -1,3 +1,4 @@
+from channels.db import aclose_old_connections
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth.models import AnonymousUser
@@ -37,3 +38,6 @@ class JWTAuthMiddleware:
         except User.DoesNotExist:
             print(f"❌ User {user_id} not found in DB")
             return AnonymousUser()
+        finally:
+            # Aks holda ulanish WebSocket yopilguncha band turadi (pool da bu slot)
+            await aclose_old_connections()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tests.counters import record_answers
+from tests.models import UserAnswers, GroupUsers
+from tests.state import get_redis, in_pool
+
+logger = logging.getLogger(__name__)
+
+LEVEL_SCORES = {'LOW': 5, 'MEDIUM': 10, 'HIGH': 15}
+
+# Redis yo'q bo'lganda javob berilgan (group, question, user) lar
+_local_claims = set()
+CLAIM_TTL = 60 * 60 * 24
+
+
+def score_answer(level: str, is_correct: bool, time_taken: float, group_time: int) -> int:
+    if not is_correct:
+        return 0
+    base_score = LEVEL_SCORES.get(level, 5)
+    group_time = group_time or 10
+    return int(round(base_score * max(0, (1 - time_taken / group_time)) * 100, 0))
+
+
+def answered_key(group_id: int, question_id: int) -> str:
+    return f"answered:{group_id}:{question_id}"
+
+
+def is_write_behind() -> bool:
+    return getattr(settings, "ANSWER_WRITE_MODE", "buffered") == "buffered"
+
+
+def answer_grace() -> float:
+    """Savol vaqti tugagandan keyin javob yana shuncha sekund qabul qilinadi (tarmoq va eventlar kechikishi uchun).
+
+    Engine ham yakuniy flush dan oldin shuncha kutadi: boshqa jarayonlardagi consumerlar
+    savol yopilganini bilguncha qabul qilgan javoblar shu oraliqda yetib keladi.
+    """
+    return getattr(settings, "ANSWER_GRACE_PERIOD", 1.0)
+
+
+async def claim_answer(group_id: int, question_id: int, user_id: int) -> bool:
+    """Javobni band qiladi: birinchi marta True, takroriy (parallel bo'lsa ham) javobda False."""
+    redis = get_redis()
+    if redis is None:
+        key = (group_id, question_id, user_id)
+        if key in _local_claims:
+            return False
+        _local_claims.add(key)
+        return True
+    key = answered_key(group_id, question_id)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.sadd(key, user_id)
+        pipe.expire(key, CLAIM_TTL)
+        added, _ = await pipe.execute()
+    return bool(added)
+
+
+class AnswerBuffer:
+    """Xona javoblarini yig'ib, UserAnswers ga bulk_create bilan yozadi.
+
+    Buferdagi qatorlar ANSWER_BUFFER_SIZE ga yetganda yoki ANSWER_BUFFER_FLUSH_INTERVAL
+    sekund o'tganda fon task da, savol yopilganda va test tugaganda esa majburan yoziladi.
+    add() hech qachon DB ga murojaat qilmaydi, shuning uchun saqlash xatolari javob
+    yo'liga (consumer) chiqmaydi.
+    Jarayon kutilmaganda to'xtasa, hali yozilmagan javoblar (eng ko'pi bilan
+    bitta oraliq yoki bitta to'plam) yo'qoladi. Bu maqbul bo'lmasa
+    ANSWER_WRITE_MODE = "immediate" qilib har bir javobni darhol yozish mumkin.
+
+    DB ga yozishda xato bo'lsa, to'plam buferga qaytariladi va xato log ga yoziladi;
+    fon flush keyingi oraliqda qayta urinadi. Bufer yopilayotganda (engine to'xtaganda)
+    ham yozilmasa, qatorlar log ga chiqariladi va xato chaqiruvchiga qaytadi.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.flush_task = None
+        self.full = asyncio.Event()
+        self.lock = asyncio.Lock()
+
+    async def add(self, row: dict):
+        # Bir foydalanuvchining bitta savolga ikkinchi javobi tashlab yuboriladi
+        self.rows.setdefault((row["user_id"], row["question_id"]), row)
+        if len(self.rows) >= getattr(settings, "ANSWER_BUFFER_SIZE", 200):
+            # Kutayotgan fon flush oraliq tugashini kutmay darhol yozadi
+            self.full.set()
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        async with self.lock:
+            if not self.rows:
+                return
+            rows, self.rows = self.rows, {}
+            try:
+                await _bulk_save(list(rows.values()))
+            except Exception:
+                # Yozish paytida kelganlardan oldingi (birinchi) javob ustun
+                self.rows = {**self.rows, **rows}
+                raise
+
+    async def close(self):
+        if self.flush_task and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+        self.flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Javoblar yozilmadi, %d ta qator yo'qoladi: %r", len(self.rows), list(self.rows.values()))
+            raise
+
+    async def _flush_later(self, retry=False):
+        interval = getattr(settings, "ANSWER_BUFFER_FLUSH_INTERVAL", 1.0)
+        if retry:
+            # Xatodan keyin to'lgan bufer ham DB ni har yangi javobda urmasligi uchun to'liq oraliq kutiladi
+            await asyncio.sleep(interval)
+        else:
+            try:
+                await asyncio.wait_for(self.full.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+        self.full.clear()
+        self.flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Javoblar buferini yozib bo'lmadi (%d ta qator), qayta uriniladi", len(self.rows))
+            if self.flush_task is None:
+                self.flush_task = asyncio.create_task(self._flush_later(retry=True))
+
+
+@in_pool
+def _bulk_save(rows):
+    # unique_user_group_question_answer takroriy qatorlarni (masalan 0 ball yozilgandan keyin kelgan javob) tashlab yuboradi,
+    # shuning uchun QuestionStat ga faqat bazada hali yo'q, ya'ni haqiqatan qo'shiladigan qatorlar kiradi
+    with transaction.atomic():
+        existing = set(
+            UserAnswers.objects.filter(
+                group_id__in={row["group_id"] for row in rows},
+                question_id__in={row["question_id"] for row in rows},
+                user_id__in={row["user_id"] for row in rows},
+            ).values_list("user_id", "group_id", "question_id")
+        )
+        new_rows = [row for row in rows if (row["user_id"], row["group_id"], row["question_id"]) not in existing]
+        UserAnswers.objects.bulk_create([UserAnswers(**row) for row in new_rows], batch_size=500, ignore_conflicts=True)
+        record_answers(new_rows)
+
+
+@in_pool
+def zero_fill_unanswered(group_id: int, question_ids) -> int:
+    """Berilgan savollarga javob bermagan a'zolarga 0 ball yozadi: har savolga bitta INSERT ... SELECT, hammasi bitta tranzaksiyada."""
+    sql = f"""
+        INSERT INTO {UserAnswers._meta.db_table}
+            (user_id, group_id, question_id, answer_id, is_correct, score, created_at)
+        SELECT gu.user_id, %s, %s, NULL, %s, 0, %s
+        FROM {GroupUsers._meta.db_table} gu
+        WHERE gu.group_id = %s
+        ON CONFLICT (user_id, group_id, question_id) DO NOTHING
+    """
+    created = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        for question_id in question_ids:
+            cursor.execute(sql, [group_id, question_id, False, created_at, group_id])
+            created += cursor.rowcount
+    return created
@@ -0,0 +1,21 @@
+import json
+
+from channels.layers import get_channel_layer
+
+from tests.protocol import pack
+
+
+def encode(payload: dict) -> dict:
+    """Kadrni bir marta, yuboruvchi tomonda kodlaydi; consumerlar uni o'zgartirmasdan uzatadi.
+
+    JSON (matn) va msgpack (binary) variantlar ikkalasi ham shu yerda tayyorlanadi.
+    """
+    return {"text": json.dumps(payload), "bytes": pack(payload)}
+
+
+async def broadcast(group_name: str, event_type: str, payload: dict, admin_payload=None, **extra):
+    """Xonaga tayyor kadr yuboradi: barcha uchun bitta, adminlar uchun ixtiyoriy ikkinchi variant."""
+    event = {"type": event_type, "frame": encode(payload), **extra}
+    if admin_payload is not None:
+        event["admin_frame"] = encode(admin_payload)
+    await get_channel_layer().group_send(group_name, event)
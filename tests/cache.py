@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Kategoriya nomi savol va xona ko'rinishlariga ham kiradi, shuning uchun u hamma kalitga qo'shiladi
+CATEGORY_TAG = "category"
+
+
+def group_tag(code: str) -> str:
+    return f"group:{code}"
+
+
+def question_tag(question_id: int) -> str:
+    return f"question:{question_id}"
+
+
+def _tag_key(tag: str) -> str:
+    return f"content_tag:{tag}"
+
+
+def tag_versions(tags) -> list:
+    """Teglarning joriy versiyalari (bitta get_many). Yo'q teg yangi versiya bilan yaratiladi."""
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*tags):
+    """Teglarga yangi versiya beradi: shu teglar bilan yozilgan barcha kesh yozuvlari eskiradi.
+
+    Versiya oshirilmaydi, balki yangi qiymat (vaqt) yoziladi: teg kalitining o'zi keshdan
+    chiqib ketsa ham eski yozuv qayta ishlatilmaydi.
+    """
+    if tags:
+        transaction.on_commit(lambda: cache.set_many({_tag_key(tag): time.time_ns() for tag in tags}, timeout=None))
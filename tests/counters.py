@@ -0,0 +1,87 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from tests import rooms
+from tests.models import Group, GroupUsers, Questions, QuestionStat, UserAnswers
+
+# Bitta INSERT dagi a'zolar soni (SQLite parametrlar chegarasi uchun)
+_MEMBERSHIP_BATCH = 300
+
+
+def shift_total_questions(deltas):
+    """deltas: {group_id: +n/-n}. Har bir xona uchun bitta F() UPDATE."""
+    changed = [group_id for group_id, delta in deltas.items() if delta]
+    for group_id in changed:
+        Group.objects.filter(id=group_id).update(total_questions=F('total_questions') + deltas[group_id])
+    if changed:
+        # total_questions keshlangan xona ma'lumotiga (tests.rooms) kiradi
+        rooms.forget(*Group.objects.filter(id__in=changed).values_list('code', flat=True))
+
+
+def record_memberships(group_id, user_ids) -> int:
+    """Yangi a'zolarni yozadi va participant_count ni haqiqatan qo'shilgan qatorlar soniga oshiradi.
+
+    Bir nechta jarayon bitta foydalanuvchini bir vaqtda yozishi mumkin, shuning uchun oldindan
+    tekshirilmaydi: ON CONFLICT DO NOTHING qaytargan rowcount hisoblanadi.
+    """
+    table = GroupUsers._meta.db_table
+    created = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        joined_date = connection.ops.adapt_datetimefield_value(timezone.now())
+        for start in range(0, len(user_ids), _MEMBERSHIP_BATCH):
+            batch = user_ids[start:start + _MEMBERSHIP_BATCH]
+            cursor.execute(
+                f"INSERT INTO {table} (group_id, user_id, joined_date) VALUES "
+                + ", ".join(["(%s, %s, %s)"] * len(batch))
+                + " ON CONFLICT (group_id, user_id) DO NOTHING",
+                [value for user_id in batch for value in (group_id, user_id, joined_date)],
+            )
+            created += cursor.rowcount
+        if created:
+            Group.objects.filter(id=group_id).update(participant_count=F('participant_count') + created)
+    return created
+
+
+def record_answers(rows):
+    """Yozilgan javoblar bo'yicha QuestionStat.answered_count ni oshiradi."""
+    counts = Counter((row["group_id"], row["question_id"]) for row in rows if row.get("answer_id"))
+    if not counts:
+        return
+    QuestionStat.objects.bulk_create(
+        [QuestionStat(group_id=group_id, question_id=question_id) for group_id, question_id in counts],
+        ignore_conflicts=True,
+    )
+    for (group_id, question_id), count in counts.items():
+        QuestionStat.objects.filter(group_id=group_id, question_id=question_id).update(
+            answered_count=F('answered_count') + count
+        )
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(queryset.values(field).annotate(c=Count('*')).values('c')), Value(0))
+
+
+@transaction.atomic
+def recompute(groups=None):
+    """Barcha (yoki berilgan) xonalar hisoblagichlarini bazadagi haqiqiy qiymatlardan qayta hisoblaydi."""
+    groups = Group.objects.all() if groups is None else groups
+    group_ids = list(groups.values_list('id', flat=True))
+    Group.objects.filter(id__in=group_ids).update(
+        total_questions=_count(Questions.group.through.objects.filter(group_id=OuterRef('id')), 'group_id'),
+        participant_count=_count(GroupUsers.objects.filter(group_id=OuterRef('id')), 'group_id'),
+    )
+    QuestionStat.objects.filter(group_id__in=group_ids).delete()
+    answered = (
+        UserAnswers.objects.filter(group_id__in=group_ids, answer__isnull=False)
+        .values('group_id', 'question_id')
+        .annotate(answered=Count('id'))
+    )
+    QuestionStat.objects.bulk_create(
+        [QuestionStat(group_id=r['group_id'], question_id=r['question_id'], answered_count=r['answered']) for r in answered],
+        batch_size=1000,
+    )
+    return len(group_ids)
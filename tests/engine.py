@@ -0,0 +1,374 @@
+import asyncio
+import logging
+import uuid
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Window
+from django.db.models.functions import Coalesce, Rank
+from django.utils import timezone
+
+from tests import presence, rooms, status
+from tests.broadcast import broadcast
+from tests.cache import group_tag, invalidate
+from tests.answers import AnswerBuffer, answer_grace, zero_fill_unanswered
+from tests.leaderboard import get_leaderboard
+from tests.snapshot import build_snapshot, get_snapshot, drop_snapshot
+from tests.models import Group, UserAnswers, Result
+from tests.state import get_redis, in_pool, releases_connection
+
+logger = logging.getLogger(__name__)
+
+# Xonalarning holati va taymerlari shu jarayondagi RoomEngine larda turadi.
+# Bitta xonani faqat bitta jarayon boshqaradi: Redis dagi lease kimda bo'lsa,
+# boshqa jarayonlar buyruqlarni "engine_<code>" guruhi orqali unga yuboradi.
+_engines = {}
+_engines_lock = None
+_local_leases = {}
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def engine_group_name(room_code: str) -> str:
+    return f"engine_{room_code}"
+
+
+def _registry_lock():
+    global _engines_lock
+    if _engines_lock is None:
+        _engines_lock = asyncio.Lock()
+    return _engines_lock
+
+
+class RoomLease:
+    def __init__(self, room_code: str):
+        self.key = f"room_lease:{room_code}"
+        self.token = uuid.uuid4().hex
+        self.ttl = getattr(settings, "ROOM_ENGINE_LEASE_TTL", 30)
+
+    async def acquire(self) -> bool:
+        redis = get_redis()
+        if redis is None:
+            if _local_leases.get(self.key) not in (None, self.token):
+                return False
+            _local_leases[self.key] = self.token
+            return True
+        return bool(await redis.set(self.key, self.token, nx=True, px=self.ttl * 1000))
+
+    async def renew(self) -> bool:
+        redis = get_redis()
+        if redis is None:
+            return _local_leases.get(self.key) == self.token
+        return bool(await redis.eval(_RENEW_SCRIPT, 1, self.key, self.token, self.ttl * 1000))
+
+    async def release(self):
+        redis = get_redis()
+        if redis is None:
+            if _local_leases.get(self.key) == self.token:
+                del _local_leases[self.key]
+            return
+        await redis.eval(_RELEASE_SCRIPT, 1, self.key, self.token)
+
+
+class RoomEngine:
+    def __init__(self, room_code: str, group_id: int):
+        self.room_code = room_code
+        self.group_id = group_id
+        self.room_group_name = f"test_{room_code}"
+        self.channel_layer = get_channel_layer()
+        self.lease = RoomLease(room_code)
+        self.buffer = AnswerBuffer()
+        self.lock = asyncio.Lock()
+        self.channel_name = None
+        self.snapshot = None
+        self.group_time = None
+        self.current_question_number = 0
+        self.last_question_id = None
+        self.open_question_id = None
+        self.closed_at = None
+        self.question_task = None
+        self.listener_task = None
+        self.heartbeat_task = None
+        self.stopped = False
+
+    async def run(self):
+        self.channel_name = await self.channel_layer.new_channel("engine")
+        status.watch(self.group_id)
+        await self.channel_layer.group_add(engine_group_name(self.room_code), self.channel_name)
+        self.listener_task = asyncio.create_task(self._listen())
+        self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        _engines.pop(self.room_code, None)
+        for task in (self.question_task, self.listener_task, self.heartbeat_task):
+            _cancel(task)
+        if self.channel_name:
+            await self.channel_layer.group_discard(engine_group_name(self.room_code), self.channel_name)
+            status.unwatch(self.group_id)
+        try:
+            await self.buffer.close()
+        except Exception:
+            # close() yozilmagan qatorlarni log ga chiqargan; lease baribir bo'shatiladi
+            pass
+        finally:
+            await self.lease.release()
+
+    async def handle(self, command: str, reply_channel=None):
+        async with self.lock:
+            if self.stopped:
+                return
+            action = {"start": self._start, "next": self._next, "finish": self._finish}.get(command)
+            error = await self._guarded(action) if action else "Noma'lum buyruq."
+            await self._stop_if_idle(error)
+        if error and reply_channel:
+            await self.channel_layer.send(reply_channel, {"type": "engine_error", "error": error})
+
+    async def _guarded(self, action):
+        """Buyruqni bajaradi; kutilmagan xato (masalan DB) log ga yoziladi va xato matni sifatida qaytadi."""
+        try:
+            return await action()
+        except Exception:
+            logger.exception("Xona %s: engine buyrug'i bajarilmadi", self.room_code)
+            return "Buyruqni bajarib bo'lmadi, qayta urinib ko'ring."
+
+    async def _stop_if_idle(self, error):
+        if error and not self.open_question_id:
+            # Buyruq bajarilmadi va test ketmayapti (masalan, tugagan xonada "start" yoki DB xatosi):
+            # engine lease ni yangilab, bo'sh turib qolmasligi kerak, boshqa jarayon xonani ola oladi
+            await self.stop()
+
+    async def _listen(self):
+        try:
+            while not self.stopped:
+                message = await self.channel_layer.receive(self.channel_name)
+                try:
+                    if message.get("type") == "engine_command":
+                        await self.handle(message["command"], message.get("reply_channel"))
+                    elif message.get("type") == "engine_answer":
+                        await self.buffer.add(message["answer"])
+                except Exception:
+                    logger.exception("Xona %s: engine xabari qayta ishlanmadi", self.room_code)
+        except Exception:
+            # Channel layer dan o'qib bo'lmaydi: tinglovchisiz engine lease ni ushlab turmasligi kerak
+            logger.exception("Xona %s: engine tinglovchisi to'xtadi", self.room_code)
+            await self.stop()
+
+    async def _heartbeat(self):
+        while not self.stopped:
+            await asyncio.sleep(max(1, self.lease.ttl // 3))
+            if not await self.lease.renew():
+                # Lease boshqa jarayonga o'tib ketgan, bu yerda xonani to'xtatamiz
+                await self.stop()
+
+    async def _start(self):
+        group = await self._get_group_obj()
+        if group.start_time:
+            return "Bu guruhda test allaqachon ishlagan yoki tugatilgan. Qayta boshlash mumkin emas."
+        self.group_time = group.time or 10
+        self.snapshot = await build_snapshot(self.group_id)
+        await self._mark_group_started()
+        await status.publish(self.group_id, is_active=True, question_id=None, question_number=0,
+                             started_at=None, time=self.group_time)
+        await broadcast(
+            self.room_group_name,
+            "test_started",
+            {"type": "test_started", "message": "Test boshlandi!", "group_id": self.group_id},
+        )
+        return await self._advance()
+
+    async def _restore(self):
+        if self.snapshot is None:
+            self.snapshot = await get_snapshot(self.group_id)
+        if self.group_time is None:
+            # Lease boshqa jarayondan o'tgan: vaqt va savol raqami umumiy holatdan tiklanadi
+            current = await status.get_status(self.group_id)
+            self.group_time = current.time or 10
+            self.current_question_number = current.question_number
+
+    async def _advance(self):
+        await self._restore()
+        q = self.snapshot.question_at(self.current_question_number)
+        if not q:
+            return await self._finish()
+
+        self.current_question_number += 1
+        self.last_question_id = q["id"]
+        self.open_question_id = q["id"]
+        started_at = timezone.now().timestamp()
+        await status.publish(self.group_id, is_active=True, question_id=q["id"],
+                             question_number=self.current_question_number, started_at=started_at,
+                             time=self.group_time)
+
+        frame = {
+            "type": "question",
+            "question": q["payload"],
+            "current_question_number": self.current_question_number,
+            "total_questions": self.snapshot.total_questions
+        }
+        await broadcast(
+            self.room_group_name,
+            "send_question",
+            frame,
+            admin_payload={**frame, "correct_answer_id": q["correct_answer_id"]},
+            # Javobni baholash uchun, mijozga yuborilmaydi
+            question_id=q["id"],
+            question_number=self.current_question_number,
+            start_time=started_at,
+            time=self.group_time,
+        )
+
+        _cancel(self.question_task)
+        self.question_task = asyncio.create_task(self._question_timer(q["id"], self.group_time))
+
+    async def _question_timer(self, question_id: int, group_time: int):
+        await asyncio.sleep(group_time)
+        async with self.lock:
+            if self.stopped or self.open_question_id != question_id:
+                return
+            await self._stop_if_idle(await self._guarded(self._next))
+
+    async def _next(self):
+        if self.open_question_id:
+            await self._close_question()
+        return await self._advance()
+
+    async def _close_question(self):
+        question_id, self.open_question_id = self.open_question_id, None
+        self.closed_at = asyncio.get_running_loop().time()
+        # Yopilganini flush dan oldin e'lon qilamiz: shu jarayondagi consumerlar holatni publish dan,
+        # boshqa jarayondagilar question_closed eventidan bilib, eski savolga javob qabul qilmaydi
+        await status.publish(self.group_id, question_id=None, started_at=None)
+        await self.channel_layer.group_send(
+            self.room_group_name, {"type": "question_closed", "question_id": question_id}
+        )
+        try:
+            await self.buffer.flush()
+        except Exception:
+            # Qatorlar buferda qoladi, keyingi flush (eng kechi yakunlashda) ularni qayta yozadi
+            logger.exception("Xona %s: savol yopilganda javoblar yozilmadi", self.room_code)
+
+    async def _finish(self):
+        if self.open_question_id:
+            await self._close_question()
+        await self._restore()
+        await self._drain()
+        await self.buffer.flush()
+        # 0 ball yakuniy flush dan keyin yoziladi, aks holda talabaga ball bilan tasdiqlangan
+        # javob ON CONFLICT DO NOTHING da 0 ball qatoriga yutqazadi
+        asked = [q["id"] for q in self.snapshot.questions[:self.current_question_number]]
+        await presence.save_members(self.room_code, self.group_id)
+        await zero_fill_unanswered(self.group_id, asked)
+        group_results = await self._mark_group_finished_and_collect_results()
+        await status.publish(self.group_id, is_active=False, question_id=None, started_at=None)
+        leaderboard = [{"user__username": r["user__username"], "score": r["score"]} for r in group_results]
+        # Yakuniy hisob DB dan olinadi va jonli reyting shu bilan tenglashtiriladi
+        await get_leaderboard(self.group_id).replace(leaderboard)
+
+        await broadcast(
+            self.room_group_name,
+            "final_results",
+            {"type": "final_results", "results": group_results},
+            admin_payload={"type": "final_results", "results": group_results, "leaderboard": leaderboard},
+        )
+        await drop_snapshot(self.group_id)
+        await self.stop()
+
+    async def _drain(self):
+        # Boshqa jarayonlardagi consumerlar question_closed ni olguncha qabul qilgan javoblar
+        # engine_answer bo'lib hali yo'lda bo'lishi mumkin; tinglovchi ularni shu oraliqda buferga qo'shadi.
+        # Savol shu engine da yopilmagan bo'lsa (lease boshqa jarayondan o'tgan), to'liq oraliq kutiladi
+        waited = asyncio.get_running_loop().time() - self.closed_at if self.closed_at is not None else 0
+        if waited < answer_grace():
+            await asyncio.sleep(answer_grace() - waited)
+
+    @releases_connection
+    async def _get_group_obj(self):
+        return await Group.objects.aget(id=self.group_id)
+
+    @in_pool
+    def _mark_group_started(self):
+        Group.objects.filter(id=self.group_id).update(is_active=True, is_used=True, start_time=timezone.now())
+        rooms.forget(self.room_code)
+        invalidate(group_tag(self.room_code))
+
+    @in_pool
+    def _mark_group_finished_and_collect_results(self):
+        # Ball va o'rin bitta so'rovda hisoblanadi; teng ballilar bir xil o'rinni oladi (1, 1, 3)
+        total = Coalesce(Sum('score'), 0)
+        qs = (
+            UserAnswers.objects.filter(group_id=self.group_id)
+            .values('user_id', 'user__username')
+            .annotate(total_score=total, rank=Window(expression=Rank(), order_by=total.desc()))
+            .order_by('rank', 'user__username')
+        )
+        rows = [
+            {"user_id": r["user_id"], "user__username": r["user__username"], "score": r["total_score"], "rank": r["rank"]}
+            for r in qs
+        ]
+        with transaction.atomic():
+            Group.objects.filter(id=self.group_id).update(is_active=False, end_time=timezone.now())
+            Result.objects.filter(group_id=self.group_id).delete()
+            Result.objects.bulk_create(
+                [
+                    Result(group_id=self.group_id, user_id=r["user_id"], score=r["score"], rank=r["rank"])
+                    for r in rows
+                ],
+                batch_size=1000,
+            )
+        rooms.forget(self.room_code)
+        invalidate(group_tag(self.room_code))
+        return rows
+
+
+def _cancel(task):
+    if task and task is not asyncio.current_task():
+        task.cancel()
+
+
+async def record_answer(room_code: str, row: dict):
+    """Baholangan javobni xona engine idagi buferga qo'shadi."""
+    engine = _engines.get(room_code)
+    if engine is not None:
+        await engine.buffer.add(row)
+        return
+    await get_channel_layer().group_send(
+        engine_group_name(room_code),
+        {"type": "engine_answer", "answer": row},
+    )
+
+
+async def dispatch(room_code: str, group_id: int, command: str, reply_channel=None):
+    """Buyruqni xona engine iga yetkazadi: shu jarayonda bo'lsa to'g'ridan-to'g'ri, aks holda channel layer orqali."""
+    async with _registry_lock():
+        engine = _engines.get(room_code)
+        if engine is None:
+            candidate = RoomEngine(room_code, group_id)
+            if await candidate.lease.acquire():
+                _engines[room_code] = candidate
+                await candidate.run()
+                engine = candidate
+
+    if engine is not None:
+        await engine.handle(command, reply_channel)
+        return
+
+    await get_channel_layer().group_send(
+        engine_group_name(room_code),
+        {"type": "engine_command", "command": command, "reply_channel": reply_channel},
+    )
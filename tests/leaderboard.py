@@ -0,0 +1,102 @@
+import asyncio
+import heapq
+
+from django.conf import settings
+
+from tests.broadcast import broadcast
+from tests.state import get_redis
+
+# Redis yo'q bo'lganda (testlar) jarayon ichidagi reytinglar
+_local_boards = {}
+# Xona bo'yicha rejalashtirilgan (hali yuborilmagan) reyting kadrlari
+_pending_broadcasts = {}
+
+
+def leaderboard_key(group_id: int) -> str:
+    return f"leaderboard:{group_id}"
+
+
+def _limit():
+    return getattr(settings, "LEADERBOARD_SIZE", 100)
+
+
+class RedisLeaderboard:
+    """Xona reytingi Redis sorted set da: yozish va top-k o'qish O(log n)."""
+
+    ttl = 60 * 60 * 24
+
+    def __init__(self, redis, group_id: int):
+        self.redis = redis
+        self.key = leaderboard_key(group_id)
+
+    async def add(self, username: str, score: int):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zincrby(self.key, score, username)
+            pipe.expire(self.key, self.ttl)
+            await pipe.execute()
+
+    async def top(self, limit=None):
+        limit = limit or _limit()
+        rows = await self.redis.zrevrange(self.key, 0, limit - 1, withscores=True)
+        return [{"user__username": member.decode(), "score": int(score)} for member, score in rows]
+
+    async def replace(self, rows):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.key)
+            if rows:
+                pipe.zadd(self.key, {r["user__username"]: r["score"] or 0 for r in rows})
+                pipe.expire(self.key, self.ttl)
+            await pipe.execute()
+
+
+class LocalLeaderboard:
+    def __init__(self, group_id: int):
+        self.scores = _local_boards.setdefault(group_id, {})
+
+    async def add(self, username: str, score: int):
+        self.scores[username] = self.scores.get(username, 0) + score
+
+    async def top(self, limit=None):
+        limit = limit or _limit()
+        rows = heapq.nlargest(limit, self.scores.items(), key=lambda item: item[1])
+        return [{"user__username": username, "score": score} for username, score in rows]
+
+    async def replace(self, rows):
+        self.scores.clear()
+        self.scores.update({r["user__username"]: r["score"] or 0 for r in rows})
+
+
+def get_leaderboard(group_id: int):
+    redis = get_redis()
+    if redis is None:
+        return LocalLeaderboard(group_id)
+    return RedisLeaderboard(redis, group_id)
+
+
+def admin_group_name(room_code: str) -> str:
+    return f"test_{room_code}_admin"
+
+
+def schedule_leaderboard_broadcast(room_code: str, group_id: int):
+    """Reytingni adminlarga yuborishni rejalashtiradi.
+
+    Oraliq (LEADERBOARD_BROADCAST_INTERVAL) ichida kelgan barcha javoblar bitta
+    kadrga birlashtiriladi, shuning uchun javoblar soni qancha bo'lishidan
+    qat'i nazar adminlar sekundiga bir necha kadrdan ko'p olmaydi.
+    """
+    if room_code in _pending_broadcasts:
+        return
+    _pending_broadcasts[room_code] = asyncio.create_task(_broadcast_later(room_code, group_id))
+
+
+async def _broadcast_later(room_code: str, group_id: int):
+    try:
+        await asyncio.sleep(getattr(settings, "LEADERBOARD_BROADCAST_INTERVAL", 0.25))
+    finally:
+        _pending_broadcasts.pop(room_code, None)
+    leaderboard = await get_leaderboard(group_id).top()
+    await broadcast(
+        admin_group_name(room_code),
+        "send_leaderboard_to_admin",
+        {"type": "leaderboard", "leaderboard": leaderboard},
+    )
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tests.broadcast import encode
+
+
+class _Consumer:
+    def __init__(self):
+        self.sent_bytes = 0
+
+    async def send(self, text_data=None, bytes_data=None):
+        self.sent_bytes += len(text_data or bytes_data)
+
+
+def _question_payload():
+    return {
+        "question": {
+            "id": 1,
+            "text": "Quyidagilardan qaysi biri Python da o'zgarmas (immutable) tur hisoblanadi?",
+            "answers": [{"id": i, "text": text} for i, text in enumerate(["list", "dict", "tuple", "set"], start=1)],
+        },
+        "start_time": timezone.now().isoformat(),
+        "current_question_number": 3,
+        "total_questions": 20,
+    }
+
+
+async def _per_consumer(consumers, payload):
+    # Avvalgi yo'l: har bir consumer vaqtni qayta parse qiladi va JSON ni qayta kodlaydi
+    for consumer in consumers:
+        timezone.datetime.fromisoformat(payload["start_time"])
+        await consumer.send(text_data=json.dumps({
+            "type": "question",
+            "question": payload["question"],
+            "current_question_number": payload["current_question_number"],
+            "total_questions": payload["total_questions"],
+        }))
+
+
+async def _serialize_once(consumers, payload):
+    frame = encode({"type": "question", **payload})
+    for consumer in consumers:
+        await consumer.send(text_data=frame["text"])
+
+
+class Command(BaseCommand):
+    help = "Xonaga bitta savol tarqatishning CPU narxini (consumerlar soniga qarab) o'lchaydi."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000", help="Vergul bilan ajratilgan consumerlar soni")
+        parser.add_argument("--rounds", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        rounds = options["rounds"]
+        payload = _question_payload()
+        self.stdout.write(f"{'consumers':>10} {'per-consumer ms':>16} {'serialize-once ms':>18} {'speedup':>8}")
+        for size in sizes:
+            consumers = [_Consumer() for _ in range(size)]
+            legacy = self._measure(_per_consumer, consumers, payload, rounds)
+            once = self._measure(_serialize_once, consumers, payload, rounds)
+            self.stdout.write(f"{size:>10} {legacy:>16.2f} {once:>18.2f} {legacy / once:>7.1f}x")
+
+    @staticmethod
+    def _measure(fn, consumers, payload, rounds):
+        started = time.process_time()
+        for _ in range(rounds):
+            asyncio.run(fn(consumers, payload))
+        return (time.process_time() - started) * 1000 / rounds
@@ -0,0 +1,65 @@
+import json
+import time
+
+import msgpack
+from django.core.management.base import BaseCommand
+
+from tests.protocol import pack
+
+
+def _frames(participants):
+    question = {
+        "type": "question",
+        "question": {
+            "id": 1204,
+            "text": "Quyidagilardan qaysi biri Python da o'zgarmas (immutable) tur hisoblanadi?",
+            "answers": [{"id": 4810 + i, "text": text} for i, text in enumerate(["list", "dict", "tuple", "set"])],
+        },
+        "current_question_number": 3,
+        "total_questions": 20,
+    }
+    leaderboard = {
+        "type": "leaderboard",
+        "leaderboard": [{"user__username": f"student{i}", "score": 15000 - i * 7} for i in range(100)],
+    }
+    final_results = {
+        "type": "final_results",
+        "results": [
+            {"user_id": 1000 + i, "user__username": f"student{i}", "score": 15000 - i * 7, "rank": i + 1}
+            for i in range(participants)
+        ],
+    }
+    return {"question": question, "leaderboard": leaderboard, "final_results": final_results}
+
+
+class Command(BaseCommand):
+    help = "JSON va msgpack kadrlarining hajmi hamda kodlash/dekodlash vaqtini solishtiradi."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participants", type=int, default=1000, help="final_results dagi qatorlar soni")
+        parser.add_argument("--rounds", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rounds = options["rounds"]
+        self.stdout.write(
+            f"{'frame':>14} {'json B':>9} {'msgpack B':>10} {'json enc us':>12} {'mp enc us':>10}"
+            f" {'json dec us':>12} {'mp dec us':>10}"
+        )
+        for name, payload in _frames(options["participants"]).items():
+            text = json.dumps(payload)
+            binary = pack(payload)
+            json_enc = self._measure(lambda: json.dumps(payload), rounds)
+            mp_enc = self._measure(lambda: pack(payload), rounds)
+            json_dec = self._measure(lambda: json.loads(text), rounds)
+            mp_dec = self._measure(lambda: msgpack.unpackb(binary), rounds)
+            self.stdout.write(
+                f"{name:>14} {len(text.encode()):>9} {len(binary):>10} {json_enc:>12.1f} {mp_enc:>10.1f}"
+                f" {json_dec:>12.1f} {mp_dec:>10.1f}"
+            )
+
+    @staticmethod
+    def _measure(fn, rounds):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        return (time.perf_counter() - started) * 1_000_000 / rounds
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django.core.cache import cache, caches
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+
+from tests import rooms
+from tests.models import User, Group
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _legacy(code):
+    # Avvalgi yo'l: har bir ulanish va so'rovda Group.objects.get(code=...)
+    return Group.objects.get(code=code)
+
+
+class Command(BaseCommand):
+    help = (
+        "Ulanishlar to'lqinida xona kodini topish narxini o'lchaydi: to'g'ridan-to'g'ri DB, sovuq va "
+        "iliq kesh. Sinov xonalari oxirida o'chiriladi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=5000)
+        parser.add_argument("--connects", type=int, default=20000, help="To'lqindagi ulanishlar soni")
+        parser.add_argument("--json", dest="json_path", help="Natijani JSON faylga yozish")
+
+    def handle(self, *args, **options):
+        self.options = options
+        # Xonalar commit qilinadi: database_sync_to_async boshqa ulanishda ishlaydi va ochiq tranzaksiyani ko'rmaydi
+        codes = self.seed()
+        try:
+            report = async_to_sync(self.measure)(codes)
+        finally:
+            User.objects.filter(username="bench_rooms_admin").delete()
+            cache.delete_many([rooms._key(code) for code in codes])
+
+        self.print_report(report)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(report, f, indent=2)
+
+    def seed(self):
+        User.objects.filter(username="bench_rooms_admin").delete()
+        admin = User.objects.create(username="bench_rooms_admin", is_admin=True, password="!")
+        started = time.perf_counter()
+        codes = set()
+        while len(codes) < self.options["rooms"]:
+            codes.add(rooms.generate_code())
+        self.generate_ms = (time.perf_counter() - started) * 1000
+        Group.objects.bulk_create(
+            [Group(name=f"Xona {i}", admin=admin, code=code, time=20) for i, code in enumerate(codes)],
+            batch_size=1000,
+        )
+        return sorted(codes)
+
+    async def measure(self, codes):
+        rnd = random.Random(42)
+        # Ommabop xonalarga ulanishlar ko'proq tushadi
+        weights = [1 / (i + 1) for i in range(len(codes))]
+        storm = rnd.choices(codes, weights=weights, k=self.options["connects"])
+
+        results = {"legacy": await self._storm(storm, database_sync_to_async(_legacy))}
+        await cache.adelete_many([rooms._key(code) for code in codes])
+        rooms._local.clear()
+        results["cold"] = await self._storm(storm, rooms.aresolve)
+        results["warm"] = await self._storm(storm, rooms.aresolve)
+        return {
+            "rooms": len(codes),
+            "connects": len(storm),
+            "unique_codes": len(set(storm)),
+            "generate_ms": round(self.generate_ms, 2),
+            "cache_backend": type(caches["default"]).__name__,
+            "phases": results,
+        }
+
+    @staticmethod
+    async def _storm(storm, lookup):
+        counter = _QueryCounter()
+        latencies = []
+
+        # database_sync_to_async har bir chaqiruvda o'z ulanishini ochishi mumkin, hisoblagich hammasiga ulanadi
+        attached = []
+
+        def attach(sender, connection, **kwargs):
+            if counter not in connection.execute_wrappers:
+                connection.execute_wrappers.append(counter)
+                attached.append(connection)
+
+        async def connect(code):
+            started = time.perf_counter()
+            room = await lookup(code)
+            latencies.append((time.perf_counter() - started) * 1000)
+            return room
+
+        connection_created.connect(attach)
+        try:
+            started = time.perf_counter()
+            found = await asyncio.gather(*(connect(code) for code in storm))
+            total = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(attach)
+            for connection in attached:
+                connection.execute_wrappers.remove(counter)
+        assert all(found)
+        latencies.sort()
+        return {
+            "queries": counter.count,
+            "total_s": round(total, 3),
+            "connects_per_s": round(len(storm) / total),
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['rooms']} xona, {report['connects']} ulanish ({report['unique_codes']} xil kod), "
+            f"kodlar {report['generate_ms']} ms da generatsiya qilindi, kesh: {report['cache_backend']}"
+        )
+        self.stdout.write(f"{'phase':<8} {'queries':>8} {'total s':>8} {'conn/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, row in report["phases"].items():
+            self.stdout.write(
+                f"{name:<8} {row['queries']:>8} {row['total_s']:>8} {row['connects_per_s']:>9} "
+                f"{row['p50_ms']:>8} {row['p99_ms']:>8}"
+            )
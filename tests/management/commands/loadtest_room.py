@@ -0,0 +1,321 @@
+import asyncio
+import json
+import random
+import resource
+import statistics
+import threading
+import time
+import uuid
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+from tests import routing
+from tests.models import User, Category, Group, Questions, Answer
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class _ScopeUser:
+    """JWTAuthMiddleware o'rniga: har bir simulyatsiya qilingan ulanishga foydalanuvchini beradi."""
+
+    def __init__(self, inner, user):
+        self.inner = inner
+        self.user = user
+
+    async def __call__(self, scope, receive, send):
+        return await self.inner(dict(scope, user=self.user), receive, send)
+
+
+class _QueryCounter:
+    """Barcha thread lardagi DB ulanishlaridagi so'rovlarni va ulanishlar ochilishini sanaydi."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.connects = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.total += 1
+        return execute(sql, params, many, context)
+
+    def attach(self, sender=None, connection=None, **kwargs):
+        if sender is not None:
+            # connection_created: pool bo'lsa pool dan olish, bo'lmasa yangi TCP ulanish
+            with self.lock:
+                self.connects += 1
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        p50 = p95 = p99 = ordered[0]
+    else:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def _pool_report(pool):
+    """psycopg pool statistikasi (DB_POOL o'chiq bo'lsa None)."""
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    return {
+        "max_size": stats.get("pool_max"),
+        "connections_opened": stats.get("connections_num", 0),
+        "requests": stats.get("requests_num", 0),
+        "requests_waited": stats.get("requests_queued", 0),
+        "wait_ms": stats.get("requests_wait_ms", 0),
+    }
+
+
+class _RoomRun:
+    """Bitta xonaning yuklama holati: savol yuborilgan vaqt va javoblar hisobi."""
+
+    def __init__(self, group, students):
+        self.group = group
+        self.students = students
+        self.question_sent_at = None
+        self.joined = 0
+        self.answered = 0
+        self.all_joined = asyncio.Event()
+        self.all_answered = asyncio.Event()
+
+
+class Command(BaseCommand):
+    help = (
+        "Jonli test xonasini sintetik yuklama bilan sinaydi: minglab o'quvchilar TestConsumer ga "
+        "ulanadi, savollarni oladi va real vaqt taqsimotida javob beradi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=500, help="Har bir xonadagi o'quvchilar soni")
+        parser.add_argument("--rooms", type=int, default=1, help="Bir vaqtda ishlaydigan xonalar soni")
+        parser.add_argument("--questions", type=int, default=5)
+        parser.add_argument("--question-time", type=int, default=20, help="Group.time (sekund)")
+        parser.add_argument("--think-median", type=float, default=3.0,
+                            help="O'quvchi javob berish vaqtining medianasi (sekund, log-normal)")
+        parser.add_argument("--join-rate", type=float, default=0,
+                            help="Sekundiga ulanishlar soni, 0 bo'lsa hammasi birdaniga")
+        parser.add_argument("--channel-layer", choices=("memory", "default"), default="memory",
+                            help="memory: InMemoryChannelLayer va jarayon ichidagi xona holati")
+        parser.add_argument("--write-mode", choices=("buffered", "immediate"),
+                            help="ANSWER_WRITE_MODE ni shu yuklama uchun almashtirish")
+        parser.add_argument("--json", dest="json_path", help="Natijani JSON faylga yozish (trendlar uchun)")
+        parser.add_argument("--keep", action="store_true", help="Yaratilgan ma'lumotlarni o'chirmaslik")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.run_id = uuid.uuid4().hex[:8]
+        self.queries = _QueryCounter()
+
+        overrides = {}
+        if options["channel_layer"] == "memory":
+            overrides = {"CHANNEL_LAYERS": IN_MEMORY_LAYER, "ROOM_STATE_REDIS_URL": ""}
+        if options["write_mode"]:
+            overrides["ANSWER_WRITE_MODE"] = options["write_mode"]
+
+        self.seed()
+        try:
+            with override_settings(**overrides):
+                connection_created.connect(self.queries.attach)
+                for conn in connections.all():
+                    self.queries.attach(connection=conn)
+                try:
+                    report = asyncio.run(self.run())
+                finally:
+                    connection_created.disconnect(self.queries.attach)
+                    for conn in connections.all():
+                        if self.queries in conn.execute_wrappers:
+                            conn.execute_wrappers.remove(self.queries)
+        finally:
+            if not options["keep"]:
+                self.cleanup()
+
+        self.print_report(report)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(report, f, indent=2)
+
+    def seed(self):
+        options = self.options
+        prefix = f"loadtest_{self.run_id}"
+        self.admin = User.objects.create(username=f"{prefix}_admin", is_admin=True, password="!")
+        self.category = Category.objects.create(name=prefix)
+        levels = ["LOW", "MEDIUM", "HIGH"]
+        questions = []
+        for i in range(options["questions"]):
+            question = Questions.objects.create(
+                question=f"Savol {i + 1}", level=levels[i % 3], created_by=self.admin, category=self.category,
+            )
+            Answer.objects.bulk_create([
+                Answer(question=question, answer=f"Javob {j + 1}", is_correct=(j == 0)) for j in range(4)
+            ])
+            questions.append(question)
+        self.groups = []
+        for r in range(options["rooms"]):
+            group = Group.objects.create(
+                name=f"{prefix}_{r}"[:20], admin=self.admin, code=f"{prefix}_{r}", time=options["question_time"],
+            )
+            group.questions.add(*questions)
+            self.groups.append(group)
+        User.objects.bulk_create([
+            User(username=f"{prefix}_s{i}", password="!") for i in range(options["students"] * options["rooms"])
+        ], batch_size=1000)
+        self.students = list(User.objects.filter(username__startswith=f"{prefix}_s").order_by("id"))
+
+    def cleanup(self):
+        Questions.objects.filter(category=self.category).delete()
+        Group.objects.filter(id__in=[group.id for group in self.groups]).delete()
+        self.category.delete()
+        User.objects.filter(username__startswith=f"loadtest_{self.run_id}_").delete()
+
+    def communicator(self, user, group):
+        app = _ScopeUser(URLRouter(routing.websocket_urlpatterns), user)
+        return WebsocketCommunicator(app, f"/ws/test/{group.code}/")
+
+    async def run(self):
+        options = self.options
+        self.join_latencies = []
+        self.fanout_latencies = []
+        self.feedback_latencies = []
+        self.answer_window = [None, None]
+        self.timeout = options["question_time"] * 2 + 60
+
+        queries_before = self.queries.total
+        connects_before = self.queries.connects
+        pool = getattr(connections["default"], "pool", None)
+        if pool is not None:
+            pool.pop_stats()
+        started = time.perf_counter()
+
+        per_room = options["students"]
+        runs = [
+            _RoomRun(group, self.students[i * per_room:(i + 1) * per_room]) for i, group in enumerate(self.groups)
+        ]
+        await asyncio.gather(*(self.room(run) for run in runs))
+        answers = len(self.feedback_latencies)
+        answer_seconds = (self.answer_window[1] - self.answer_window[0]) if answers else 0
+
+        return {
+            "rooms": options["rooms"],
+            "students": options["students"],
+            "questions": options["questions"],
+            "channel_layer": options["channel_layer"],
+            "write_mode": settings.ANSWER_WRITE_MODE,
+            "duration_s": round(time.perf_counter() - started, 2),
+            "join_latency": _percentiles(self.join_latencies),
+            "question_fanout_latency": _percentiles(self.fanout_latencies),
+            "answer_feedback_latency": _percentiles(self.feedback_latencies),
+            "answers": answers,
+            "answers_per_s": round(answers / answer_seconds, 1) if answer_seconds else None,
+            "db_queries": self.queries.total - queries_before,
+            "db_connects": self.queries.connects - connects_before,
+            "db_pool": _pool_report(pool),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+    async def room(self, run):
+        options = self.options
+        admin = self.communicator(self.admin, run.group)
+        await admin.connect(timeout=self.timeout)
+        students = [
+            asyncio.create_task(self.student(run, user, index)) for index, user in enumerate(run.students)
+        ]
+
+        await asyncio.wait_for(run.all_joined.wait(), self.timeout)
+        for number in range(options["questions"]):
+            run.answered = 0
+            run.all_answered.clear()
+            run.question_sent_at = time.perf_counter()
+            await admin.send_json_to({"action": "start_test" if number == 0 else "next_question"})
+            try:
+                await asyncio.wait_for(run.all_answered.wait(), options["question_time"])
+            except asyncio.TimeoutError:
+                pass
+        await admin.send_json_to({"action": "finish_test"})
+        await asyncio.gather(*students)
+        await admin.disconnect()
+
+    async def student(self, run, user, index):
+        options = self.options
+        if options["join_rate"]:
+            await asyncio.sleep(index / options["join_rate"])
+        comm = self.communicator(user, run.group)
+        connect_started = time.perf_counter()
+        await comm.connect(timeout=self.timeout)
+        state = {"sent_at": None}
+        answer_tasks = []
+        while True:
+            frame = json.loads(await comm.receive_from(timeout=self.timeout))
+            message_type = frame.get("type")
+            if message_type == "group_info":
+                self.join_latencies.append(time.perf_counter() - connect_started)
+                run.joined += 1
+                if run.joined == len(run.students):
+                    run.all_joined.set()
+            elif message_type == "question":
+                self.fanout_latencies.append(time.perf_counter() - run.question_sent_at)
+                answer_tasks.append(asyncio.create_task(self.answer(comm, frame["question"], state)))
+            elif message_type == "answer_feedback":
+                now = time.perf_counter()
+                self.feedback_latencies.append(now - state["sent_at"])
+                self.answer_window[1] = now
+                run.answered += 1
+                if run.answered == len(run.students):
+                    run.all_answered.set()
+            elif message_type == "final_results":
+                break
+        for task in answer_tasks:
+            task.cancel()
+        await comm.disconnect()
+
+    async def answer(self, comm, question, state):
+        options = self.options
+        # Javob berish vaqti log-normal: ko'pchilik tez, ba'zilar oxirgi soniyalarda
+        delay = random.lognormvariate(0, 0.6) * options["think_median"]
+        await asyncio.sleep(min(delay, options["question_time"] * 0.9))
+        answer = random.choice(question["answers"])
+        state["sent_at"] = time.perf_counter()
+        if self.answer_window[0] is None:
+            self.answer_window[0] = state["sent_at"]
+        await comm.send_json_to({"action": "submit_answer", "question_id": question["id"], "answer_id": answer["id"]})
+
+    def print_report(self, report):
+        self.stdout.write(f"rooms={report['rooms']} students={report['students']} questions={report['questions']} "
+                          f"layer={report['channel_layer']} write_mode={report['write_mode']} duration={report['duration_s']}s")
+        for key in ("join_latency", "question_fanout_latency", "answer_feedback_latency"):
+            stats = report[key]
+            if not stats["count"]:
+                self.stdout.write(f"  {key:<26} n=0")
+                continue
+            self.stdout.write(
+                f"  {key:<26} n={stats['count']:<7} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms"
+            )
+        self.stdout.write(f"  answers={report['answers']} answers_per_s={report['answers_per_s']}")
+        self.stdout.write(f"  db_queries={report['db_queries']} db_connects={report['db_connects']} "
+                          f"peak_rss={report['peak_rss_mb']}MB")
+        pool = report["db_pool"]
+        if pool:
+            self.stdout.write(
+                f"  pool: max={pool['max_size']} opened={pool['connections_opened']} "
+                f"requests={pool['requests']} waited={pool['requests_waited']} wait_ms={pool['wait_ms']}"
+            )
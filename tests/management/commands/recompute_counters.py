@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tests.counters import recompute
+from tests.models import Group
+
+
+class Command(BaseCommand):
+    help = (
+        "Group.total_questions, Group.participant_count va QuestionStat.answered_count "
+        "hisoblagichlarini bazadagi haqiqiy qiymatlardan qayta hisoblaydi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("codes", nargs="*", help="Xona kodlari (bo'sh bo'lsa barcha xonalar)")
+
+    def handle(self, *args, **options):
+        groups = Group.objects.filter(code__in=options["codes"]) if options["codes"] else None
+        count = recompute(groups)
+        self.stdout.write(self.style.SUCCESS(f"{count} ta xona hisoblagichlari qayta hisoblandi"))
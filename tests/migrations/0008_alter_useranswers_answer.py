@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0007_group_total_questions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='useranswers',
+            name='answer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tests.answer'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    UserAnswers = apps.get_model('tests', 'UserAnswers')
+    keep_ids = (
+        UserAnswers.objects.values('user_id', 'group_id', 'question_id')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    UserAnswers.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0008_alter_useranswers_answer'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='useranswers',
+            constraint=models.UniqueConstraint(fields=('user', 'group', 'question'), name='unique_user_group_question_answer'),
+        ),
+    ]
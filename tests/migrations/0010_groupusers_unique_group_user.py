@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_memberships(apps, schema_editor):
+    GroupUsers = apps.get_model('tests', 'GroupUsers')
+    keep_ids = (
+        GroupUsers.objects.values('group_id', 'user_id')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    GroupUsers.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0009_useranswers_unique_user_group_question_answer'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_memberships, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='groupusers',
+            constraint=models.UniqueConstraint(fields=('group', 'user'), name='unique_group_user'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:05
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models.functions import Cast, Upper
+
+
+def search_indexes():
+    # api/search.py dagi ifodalar bilan bir xil bo'lishi kerak, aks holda Postgres indeksni ishlatmaydi
+    return [
+        GinIndex(SearchVector('question', config='simple'), name='questions_question_fts'),
+        GinIndex(
+            OpClass(Upper(Cast('question', models.TextField())), name='gin_trgm_ops'),
+            name='questions_question_trgm',
+        ),
+    ]
+
+
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Questions = apps.get_model('tests', 'Questions')
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index in search_indexes():
+        schema_editor.add_index(Questions, index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Questions = apps.get_model('tests', 'Questions')
+    for index in search_indexes():
+        schema_editor.remove_index(Questions, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0010_groupusers_unique_group_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
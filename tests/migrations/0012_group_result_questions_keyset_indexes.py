@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0011_questions_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['admin', 'id'], name='group_admin_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questions',
+            index=models.Index(fields=['created_by', 'id'], name='questions_owner_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['user', 'id'], name='result_user_id_idx'),
+        ),
+    ]
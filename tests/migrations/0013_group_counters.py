@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset):
+    return Coalesce(Subquery(queryset.values('group_id').annotate(c=Count('*')).values('c')), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    # total_questions shu paytgacha hech qachon yangilanmagan edi
+    Group = apps.get_model('tests', 'Group')
+    Questions = apps.get_model('tests', 'Questions')
+    GroupUsers = apps.get_model('tests', 'GroupUsers')
+    UserAnswers = apps.get_model('tests', 'UserAnswers')
+    QuestionStat = apps.get_model('tests', 'QuestionStat')
+    Group.objects.update(
+        total_questions=_count(Questions.group.through.objects.filter(group_id=OuterRef('id'))),
+        participant_count=_count(GroupUsers.objects.filter(group_id=OuterRef('id'))),
+    )
+    answered = (
+        UserAnswers.objects.filter(answer__isnull=False)
+        .values('group_id', 'question_id')
+        .annotate(answered=Count('id'))
+    )
+    QuestionStat.objects.bulk_create(
+        [QuestionStat(group_id=r['group_id'], question_id=r['question_id'], answered_count=r['answered']) for r in answered],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0012_group_result_questions_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='QuestionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered_count', models.PositiveIntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='tests.group')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tests.questions')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'question'), name='unique_question_stat')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_codes(apps, schema_editor):
+    # Unique indeks qo'yishdan oldin takroriy kodlar: eng eski xona kodini saqlaydi, qolganlariga id qo'shiladi
+    Group = apps.get_model('tests', 'Group')
+    duplicates = Group.objects.values('code').annotate(n=Count('id')).filter(n__gt=1).values_list('code', flat=True)
+    for code in list(duplicates):
+        for group in Group.objects.filter(code=code).order_by('id')[1:]:
+            Group.objects.filter(id=group.id).update(code=f"{code}-{group.id}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0013_group_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='group',
+            name='code',
+            field=models.CharField(unique=True),
+        ),
+    ]
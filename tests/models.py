@@ -9,13 +9,21 @@ class Group(models.Model):
     name = models.CharField(max_length=20)
     description = models.TextField(null=True, blank=True)
     admin = models.ForeignKey(User, on_delete=models.CASCADE)
-    code = models.CharField()
+    code = models.CharField(unique=True)
     time = models.IntegerField()
     start_time = models.DateTimeField(null=True, blank=True)
     end_time = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=False)
     is_used = models.BooleanField(default=False)
+    # tests/counters.py orqali F() bilan yangilanadi; recompute_counters buyrug'i qayta hisoblaydi
     total_questions = models.PositiveIntegerField(default=0)
+    participant_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['admin', 'id'], name='group_admin_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 level = {
@@ -30,6 +38,12 @@ class Questions(models.Model):
     level = models.CharField(choices=level, max_length=20)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey('Category', on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'id'], name='questions_owner_id_idx'),
+        ]
+
     def __str__(self):
         return self.question
 
@@ -52,21 +66,52 @@ class Result(models.Model):
     group = models.ForeignKey('Group', on_delete=models.CASCADE)
     score = models.IntegerField()
     rank = models.IntegerField(default = 0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='result_user_id_idx'),
+        ]
+
     def __str__(self):
         return self.user.username
 class GroupUsers(models.Model):
     group = models.ForeignKey('Group', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     joined_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'user'], name='unique_group_user'),
+        ]
+
     def __str__(self):
         return self.group.name
 class UserAnswers(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    answer = models.ForeignKey('Answer', on_delete=models.CASCADE)
+    answer = models.ForeignKey('Answer', on_delete=models.CASCADE, null=True, blank=True)
     question = models.ForeignKey('Questions', on_delete=models.CASCADE)
     is_correct = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     score = models.IntegerField()
     group = models.ForeignKey('Group', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'group', 'question'], name='unique_user_group_question_answer'),
+        ]
+
     def __str__(self):
         return self.user.username
+class QuestionStat(models.Model):
+    """Xonadagi har bir savolga berilgan javoblar soni (0 ball bilan to'ldirilganlar hisobga kirmaydi)."""
+    group = models.ForeignKey('Group', on_delete=models.CASCADE, related_name='question_stats')
+    question = models.ForeignKey('Questions', on_delete=models.CASCADE)
+    answered_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'question'], name='unique_question_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.group_id}:{self.question_id}"
@@ -0,0 +1,147 @@
+import asyncio
+
+from django.conf import settings
+
+from tests import rooms
+from tests.broadcast import broadcast
+from tests.cache import group_tag, invalidate
+from tests.counters import record_memberships
+from tests.state import get_redis, in_pool
+
+# Redis yo'q bo'lganda: room_code -> {username: ulanishlar soni}
+_local_online = {}
+# Hali yuborilmagan qo'shilish/chiqishlar va yozilmagan a'zoliklar
+_pending = {}
+# Redis yo'q bo'lganda: group_id -> xonaga ulangan foydalanuvchi id lari
+_local_members = {}
+
+PRESENCE_TTL = 60 * 60 * 24
+
+
+class _PendingPresence:
+    def __init__(self, group_id: int):
+        self.group_id = group_id
+        self.joined = []
+        self.left = []
+        self.member_ids = set()
+        self.task = None
+
+
+def _key(room_code: str) -> str:
+    return f"presence:{room_code}"
+
+
+def _members_key(group_id: int) -> str:
+    return f"room_members:{group_id}"
+
+
+async def _change(room_code: str, username: str, delta: int) -> int:
+    """Foydalanuvchining ochiq ulanishlari sonini o'zgartiradi (bir nechta tab ham hisobga olinadi)."""
+    redis = get_redis()
+    if redis is None:
+        online = _local_online.setdefault(room_code, {})
+        value = online.get(username, 0) + delta
+        if value > 0:
+            online[username] = value
+        else:
+            online.pop(username, None)
+        return value
+    key = _key(room_code)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hincrby(key, username, delta)
+        pipe.expire(key, PRESENCE_TTL)
+        value, _ = await pipe.execute()
+    if value <= 0:
+        await redis.hdel(key, username)
+    return value
+
+
+async def online_count(room_code: str) -> int:
+    redis = get_redis()
+    if redis is None:
+        return len(_local_online.get(room_code, {}))
+    return await redis.hlen(_key(room_code))
+
+
+def _schedule(room_code: str, group_id: int):
+    pending = _pending.get(room_code)
+    if pending is None:
+        pending = _pending[room_code] = _PendingPresence(group_id)
+        pending.task = asyncio.create_task(_flush_later(room_code))
+    return pending
+
+
+async def _remember_member(group_id: int, user_id: int):
+    # A'zolik GroupUsers ga oraliq oxirida yoziladi; engine yakunlashda barcha jarayonlardagi
+    # a'zolarni shu to'plamdan oladi
+    redis = get_redis()
+    if redis is None:
+        _local_members.setdefault(group_id, set()).add(user_id)
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.sadd(_members_key(group_id), user_id)
+        pipe.expire(_members_key(group_id), PRESENCE_TTL)
+        await pipe.execute()
+
+
+async def join(room_code: str, group_id: int, user_id: int, username: str):
+    first_connection = await _change(room_code, username, 1) == 1
+    await _remember_member(group_id, user_id)
+    pending = _schedule(room_code, group_id)
+    pending.member_ids.add(user_id)
+    if first_connection:
+        pending.joined.append(username)
+
+
+async def leave(room_code: str, group_id: int, username: str):
+    if await _change(room_code, username, -1) <= 0:
+        _schedule(room_code, group_id).left.append(username)
+
+
+async def _flush_later(room_code: str):
+    """PRESENCE_BROADCAST_INTERVAL davomidagi barcha qo'shilish/chiqishlarni bitta kadrda yuboradi.
+
+    Shu bilan N ta o'quvchi ulanganda N² emas, har oraliqda bittadan xabar tarqaladi,
+    a'zoliklar esa bitta bulk_create bilan yoziladi.
+    """
+    try:
+        await asyncio.sleep(getattr(settings, "PRESENCE_BROADCAST_INTERVAL", 1.0))
+    finally:
+        pending = _pending.pop(room_code)
+    if pending.member_ids:
+        await _save_memberships(room_code, pending.group_id, pending.member_ids)
+    if not pending.joined and not pending.left:
+        return
+    await broadcast(
+        f"test_{room_code}",
+        "presence",
+        {
+            "type": "presence",
+            "count": await online_count(room_code),
+            "joined": pending.joined,
+            "left": pending.left,
+        },
+    )
+
+
+async def save_members(room_code: str, group_id: int):
+    """Xonaga ulangan (hali yozilmagan bo'lishi mumkin) barcha a'zolarni GroupUsers ga yozadi.
+
+    Engine 0 ball yozish va natijalarni hisoblashdan oldin chaqiradi: oxirgi oraliqda yoki
+    boshqa jarayonga ulangan talaba ham natijalarga kiradi.
+    """
+    redis = get_redis()
+    if redis is None:
+        user_ids = _local_members.pop(group_id, set())
+    else:
+        user_ids = {int(user_id) for user_id in await redis.smembers(_members_key(group_id))}
+    if user_ids:
+        await _save_memberships(room_code, group_id, user_ids)
+
+
+@in_pool
+def _save_memberships(room_code: str, group_id: int, user_ids):
+    if record_memberships(group_id, list(user_ids)):
+        # participant_count GroupEditor.get va keshlangan xona yozuviga kiradi
+        rooms.forget(room_code)
+        invalidate(group_tag(room_code))
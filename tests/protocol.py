@@ -0,0 +1,62 @@
+import msgpack
+
+# ws/test/<room_code>/ uchun subprotocol lar. Mijoz hech narsa so'ramasa JSON ishlatiladi.
+JSON = "kaxoot.json"
+MSGPACK = "kaxoot.msgpack"
+SUBPROTOCOLS = (MSGPACK, JSON)
+
+# msgpack kadrlarida "type" o'rniga qisqa butun son ("t") yuboriladi
+MESSAGE_TYPES = {
+    "question": 1,
+    "answer_feedback": 2,
+    "leaderboard": 3,
+    "final_results": 4,
+    "presence": 5,
+    "test_started": 6,
+    "group_info": 7,
+    "info": 8,
+    "error": 9,
+    "message": 10,
+    "student_answer": 11,
+    "resume": 12,
+}
+
+# Kiruvchi msgpack kadrlarida "action" o'rniga "a"
+ACTIONS = {
+    1: "start_test",
+    2: "next_question",
+    3: "finish_test",
+    4: "submit_answer",
+}
+
+
+def negotiate(requested) -> str | None:
+    """Mijoz so'ragan subprotocol lardan birinchi qo'llab-quvvatlanganini tanlaydi."""
+    for subprotocol in requested or ():
+        if subprotocol in SUBPROTOCOLS:
+            return subprotocol
+    return None
+
+
+def pack(payload: dict) -> bytes:
+    data = dict(payload)
+    message_type = data.pop("type")
+    return msgpack.packb({"t": MESSAGE_TYPES.get(message_type, message_type), **data})
+
+
+class FrameError(ValueError):
+    """Kiruvchi binar kadrni msgpack sifatida o'qib bo'lmadi."""
+
+
+def unpack_action(data: bytes) -> dict:
+    try:
+        message = msgpack.unpackb(data)
+    except (ValueError, TypeError, msgpack.UnpackException) as exc:
+        # msgpack xatolarining matni ko'pincha bo'sh, mijozga tushunarli xabar qaytariladi
+        raise FrameError("Kadr noto‘g‘ri: msgpack o‘qilmadi.") from exc
+    if not isinstance(message, dict):
+        return {}
+    action = message.pop("a", None)
+    if action is not None:
+        message["action"] = ACTIONS.get(action, action)
+    return message
@@ -0,0 +1,23 @@
+from django.db import IntegrityError, transaction
+
+from tests.counters import record_answers
+from tests.models import User as AppUser, UserAnswers
+from tests.state import in_pool, releases_connection
+
+
+@releases_connection
+async def get_or_create_app_user(username: str, is_admin: bool):
+    app_user, _ = await AppUser.objects.aget_or_create(username=username, defaults={"is_admin": is_admin})
+    return app_user
+
+
+@in_pool
+def save_answer(row: dict) -> bool:
+    """ANSWER_WRITE_MODE = "immediate" uchun: javob va QuestionStat bitta tranzaksiyada. Takror bo'lsa False."""
+    try:
+        with transaction.atomic():
+            UserAnswers.objects.create(**row)
+            record_answers([row])
+    except IntegrityError:
+        return False
+    return True
@@ -0,0 +1,47 @@
+import time
+
+from tests.answers import answered_key, _local_claims
+from tests.leaderboard import RedisLeaderboard, leaderboard_key, _local_boards
+from tests.snapshot import get_snapshot
+from tests.state import get_redis
+from tests.status import get_status
+
+
+async def load_resume(group_id: int, user_id: int, username: str):
+    """Qayta ulangan talaba uchun joriy savol, server deadline, o'z bali va javob bergan-bermagani.
+
+    Xona holati va savol matni jarayon nusxasidan olinadi; talabaga tegishli qism
+    bitta Redis pipeline da o'qiladi, DB ga murojaat qilinmaydi.
+    Test ketmayotgan yoki savol hali tarqatilmagan bo'lsa None qaytadi.
+    Reytingga 0 ball qo'shilgani uchun talaba reytingda ham paydo bo'ladi.
+    """
+    current = await get_status(group_id)
+    if not current.is_active or not current.question_id:
+        return None
+    snapshot = await get_snapshot(group_id)
+    question = snapshot.by_id.get(current.question_id)
+    if question is None:
+        return None
+
+    redis = get_redis()
+    if redis is None:
+        scores = _local_boards.setdefault(group_id, {})
+        score = scores.setdefault(username, 0)
+        answered = (group_id, current.question_id, user_id) in _local_claims
+    else:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zincrby(leaderboard_key(group_id), 0, username)
+            pipe.expire(leaderboard_key(group_id), RedisLeaderboard.ttl)
+            pipe.sismember(answered_key(group_id, current.question_id), user_id)
+            score, _, answered = await pipe.execute()
+
+    return {
+        "type": "resume",
+        "question": question["payload"],
+        "current_question_number": current.question_number,
+        "total_questions": snapshot.total_questions,
+        "deadline": current.started_at + (current.time or 10),
+        "server_time": time.time(),
+        "score": int(score),
+        "answered": bool(answered),
+    }
@@ -0,0 +1,109 @@
+import asyncio
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from tests.models import Group
+from tests.state import in_pool
+
+# Adashtiradigan belgilarsiz (0/O, 1/I/L) alifbo: 32^6 ≈ 1 mlrd kod
+CODE_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+CODE_LENGTH = 6
+ROOM_TTL = 60 * 60
+# Mavjud bo'lmagan kod ham keshlanadi (kod bilan xona yaratilsa post_save uni o'chiradi)
+_MISSING = {}
+# WebSocket ulanishlari uchun jarayon ichidagi qisqa muddatli nusxa: code -> (muddati, yozuv).
+# Django keshining async metodlari baribir thread orqali ishlaydi, bu yerda esa hech qanday kutish yo'q.
+_local = {}
+_LOCAL_MAX = 10000
+# Bir vaqtda kelgan bir xil kodlar uchun bitta yuklash
+_pending = {}
+
+
+def generate_code(length: int = CODE_LENGTH) -> str:
+    """Bazada hali yo'q tasodifiy qisqa kod. Poyga holati Group.code unique indeksi bilan ushlanadi."""
+    while True:
+        code = "".join(secrets.choice(CODE_ALPHABET) for _ in range(length))
+        if not Group.objects.filter(code=code).exists():
+            return code
+
+
+def group_status(group) -> str:
+    if group.is_active:
+        return "active"
+    if group.end_time:
+        return "finished"
+    return "waiting"
+
+
+class Room:
+    """Xona kodi bo'yicha keshlanadigan qisqa ma'lumot: marshrutlash, egalik va holat tekshiruvlari uchun."""
+
+    __slots__ = ("id", "code", "admin_id", "name", "description", "time",
+                 "start_time", "end_time", "is_active", "total_questions", "participant_count")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    @property
+    def status(self) -> str:
+        return group_status(self)
+
+
+def _key(code: str) -> str:
+    return f"room:{code}"
+
+
+def _load(code: str) -> dict:
+    return Group.objects.filter(code=code).values(*Room.__slots__).first() or _MISSING
+
+
+def resolve(code: str):
+    """Kod bo'yicha xona: keshda bo'lsa 0 ta, bo'lmasa 1 ta so'rov. Topilmasa None."""
+    row = cache.get(_key(code))
+    if row is None:
+        row = _load(code)
+        cache.set(_key(code), row, ROOM_TTL)
+    return Room(**row) if row else None
+
+
+async def aresolve(code: str):
+    """resolve() ning async varianti. Boshqa jarayondagi o'zgarish ROOM_LOCAL_TTL soniyagacha kechikishi mumkin."""
+    now = time.monotonic()
+    entry = _local.get(code)
+    if entry is not None and entry[0] >= now:
+        return entry[1]
+    task = _pending.get(code)
+    if task is None:
+        task = asyncio.ensure_future(in_pool(resolve)(code))
+        _pending[code] = task
+        task.add_done_callback(lambda _: _pending.pop(code, None))
+    room = await asyncio.shield(task)
+    if len(_local) >= _LOCAL_MAX:
+        _local.clear()
+    _local[code] = (time.monotonic() + getattr(settings, "ROOM_LOCAL_TTL", 2), room)
+    return room
+
+
+def get_room_or_404(code: str) -> Room:
+    room = resolve(code)
+    if room is None:
+        raise Http404("Xona topilmadi")
+    return room
+
+
+def forget(*codes):
+    codes = [code for code in codes if code]
+    if codes:
+        transaction.on_commit(lambda: _forget(codes))
+
+
+def _forget(codes):
+    for code in codes:
+        _local.pop(code, None)
+    cache.delete_many([_key(code) for code in codes])
@@ -1,10 +1,53 @@
-from django.db.models.signals import post_save, post_delete
+from collections import Counter
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+
+from . import rooms
+from .cache import group_tag, invalidate
+from .counters import shift_total_questions
 from .models import Group, Questions
 
-@receiver([post_save, post_delete], sender=Questions)
-def update_total_questions(sender, instance, **kwargs):
-    group = instance.group
-    total = Questions.objects.filter(group=group).count()
-    group.total_questions = total
-    group.save(update_fields=['total_questions'])
+QuestionGroups = Questions.group.through
+
+
+@receiver(pre_save, sender=Group)
+def group_code_changing(sender, instance, **kwargs):
+    # Kod o'zgarsa eski kod bo'yicha keshlangan xona va ko'rinish ham eskirishi kerak
+    if instance.pk:
+        old_code = Group.objects.filter(pk=instance.pk).values_list('code', flat=True).first()
+        if old_code and old_code != instance.code:
+            rooms.forget(old_code)
+            invalidate(group_tag(old_code))
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, instance, **kwargs):
+    rooms.forget(instance.code)
+    invalidate(group_tag(instance.code))
+
+
+@receiver(m2m_changed, sender=QuestionGroups)
+def update_total_questions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        # post_add dagi pk_set faqat haqiqatan qo'shilgan bog'lanishlar
+        if reverse:
+            shift_total_questions({instance.id: len(pk_set)})
+        else:
+            shift_total_questions({group_id: 1 for group_id in pk_set})
+    elif action in ('pre_remove', 'pre_clear'):
+        # pre_remove dagi pk_set mavjud bo'lmagan bog'lanishlarni ham o'z ichiga olishi mumkin
+        links = QuestionGroups.objects.filter(**({'group_id': instance.id} if reverse else {'questions_id': instance.id}))
+        if pk_set is not None:
+            links = links.filter(**({'questions_id__in': pk_set} if reverse else {'group_id__in': pk_set}))
+        deltas = Counter()
+        for group_id in links.values_list('group_id', flat=True):
+            deltas[group_id] -= 1
+        shift_total_questions(deltas)
+
+
+@receiver(pre_delete, sender=Questions)
+def question_deleted(sender, instance, **kwargs):
+    # Savol o'chirilganda M2M bog'lanishlar m2m_changed siz o'chadi
+    group_ids = QuestionGroups.objects.filter(questions_id=instance.id).values_list('group_id', flat=True)
+    shift_total_questions({group_id: -1 for group_id in group_ids})
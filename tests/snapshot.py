@@ -0,0 +1,105 @@
+import json
+
+from tests.models import Questions
+from tests.state import get_redis, releases_connection
+
+# Test davomida o'zgarmaydigan savollar nusxasi, jarayondagi barcha consumerlar uchun bitta
+_snapshots = {}
+
+SNAPSHOT_TTL = 60 * 60 * 24
+
+
+class QuizSnapshot:
+    """Guruh savollarining test boshlanganda olingan o'zgarmas nusxasi.
+
+    Har bir savol uchun mijozga yuboriladigan tayyor ``payload`` (is_correct siz),
+    to'g'ri javob id si, javob id lari va darajasi saqlanadi, shuning uchun
+    savol tarqatish va javobni baholash DB ga murojaat qilmaydi.
+    """
+
+    __slots__ = ("group_id", "questions", "by_id")
+
+    def __init__(self, group_id: int, questions):
+        self.group_id = group_id
+        self.questions = tuple(questions)
+        self.by_id = {q["id"]: q for q in self.questions}
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.questions)
+
+    def question_at(self, index: int):
+        if 0 <= index < len(self.questions):
+            return self.questions[index]
+        return None
+
+    def to_json(self) -> str:
+        return json.dumps([
+            {**q, "answer_ids": sorted(q["answer_ids"])} for q in self.questions
+        ])
+
+    @classmethod
+    def from_json(cls, group_id: int, data):
+        questions = json.loads(data)
+        for q in questions:
+            q["answer_ids"] = frozenset(q["answer_ids"])
+        return cls(group_id, questions)
+
+
+@releases_connection
+async def _load_from_db(group_id: int) -> QuizSnapshot:
+    questions = []
+    qs = Questions.objects.filter(group__id=group_id).order_by("id").prefetch_related("answers")
+    async for q in qs:
+        answers = sorted(q.answers.all(), key=lambda a: a.id)
+        questions.append({
+            "id": q.id,
+            "level": q.level,
+            "correct_answer_id": next((a.id for a in answers if a.is_correct), None),
+            "answer_ids": frozenset(a.id for a in answers),
+            "payload": {
+                "id": q.id,
+                "text": q.question,
+                "answers": [{"id": a.id, "text": a.answer} for a in answers],
+            },
+        })
+    return QuizSnapshot(group_id, questions)
+
+
+def _key(group_id: int) -> str:
+    return f"quiz_snapshot:{group_id}"
+
+
+async def build_snapshot(group_id: int) -> QuizSnapshot:
+    """Test boshlanishida DB dan bir marta o'qib, jarayon va Redis ga joylaydi."""
+    snapshot = await _load_from_db(group_id)
+    _snapshots[group_id] = snapshot
+    redis = get_redis()
+    if redis is not None:
+        await redis.set(_key(group_id), snapshot.to_json(), ex=SNAPSHOT_TTL)
+    return snapshot
+
+
+async def get_snapshot(group_id: int) -> QuizSnapshot:
+    snapshot = _snapshots.get(group_id)
+    if snapshot is not None:
+        return snapshot
+    redis = get_redis()
+    if redis is not None:
+        data = await redis.get(_key(group_id))
+        if data:
+            snapshot = QuizSnapshot.from_json(group_id, data)
+            _snapshots[group_id] = snapshot
+            return snapshot
+    return await build_snapshot(group_id)
+
+
+def forget_snapshot(group_id: int):
+    _snapshots.pop(group_id, None)
+
+
+async def drop_snapshot(group_id: int):
+    forget_snapshot(group_id)
+    redis = get_redis()
+    if redis is not None:
+        await redis.delete(_key(group_id))
@@ -0,0 +1,56 @@
+import asyncio
+import functools
+import weakref
+
+from channels.db import aclose_old_connections, database_sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from redis import asyncio as aioredis
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    """Joriy event loop uchun Redis klienti, ROOM_STATE_REDIS_URL bo'sh bo'lsa None."""
+    url = getattr(settings, "ROOM_STATE_REDIS_URL", "")
+    if not url:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = aioredis.Redis.from_url(url)
+        _clients[loop] = client
+    return client
+
+
+def in_pool(func):
+    """Tranzaksiya kerak bo'lgan sinxron kodni umumiy thread pool da bajaradi.
+
+    database_sync_to_async sukut bo'yicha thread_sensitive: jarayondagi barcha xonalarning
+    DB ishi bitta thread ortida navbat kutadi. Bunday funksiyalar faqat argumentlari bilan
+    ishlashi (consumer/engine holatiga tegmasligi) kerak, shunda parallel thread lar xavfsiz.
+    SQLite da yozuvchi bitta, parallel thread lar faqat "database is locked" ni kutadi,
+    shuning uchun u yerda avvalgidek bitta thread ishlatiladi.
+    """
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # channels close_old_connections() ni funksiya kontekstidan tashqarida chaqiradi va
+            # ulanish chaqiruvchi (consumer) kontekstida ochiq qolib ketadi; pool da bu slot band qiladi
+            close_old_connections()
+
+    return database_sync_to_async(run, thread_sensitive=connections["default"].vendor == "sqlite")
+
+
+def releases_connection(func):
+    """Async ORM (aget, afirst, async for ...) dan keyin ulanishni yopadi / pool ga qaytaradi."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            await aclose_old_connections()
+
+    return wrapper
@@ -0,0 +1,105 @@
+import json
+
+from tests.models import Group
+from tests.snapshot import forget_snapshot
+from tests.state import get_redis, releases_connection
+
+# Xonaning joriy holati jarayondagi barcha consumerlar uchun bitta nusxa.
+# Engine o'tishlarda (start / savol / finish) uni Redis ga yozadi, consumerlar esa
+# shu o'tishlar haqidagi eventlardan yangilaydi, shuning uchun javob yo'lida DB o'qilmaydi.
+# Nusxa eventlar kelib turgan paytdagina to'g'ri: xonani kuzatayotgan (consumer yoki engine)
+# hech kim qolmasa, u (va savollar nusxasi) tashlanadi va keyingi safar Redis dan o'qiladi.
+_statuses = {}
+_watchers = {}
+
+STATUS_TTL = 60 * 60 * 24
+
+
+class RoomStatus:
+    __slots__ = ("group_id", "is_active", "question_id", "question_number", "started_at", "time")
+
+    def __init__(self, group_id: int, is_active=False, question_id=None, question_number=0,
+                 started_at=None, time=None):
+        self.group_id = group_id
+        self.is_active = is_active
+        self.question_id = question_id
+        self.question_number = question_number
+        self.started_at = started_at
+        self.time = time
+
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        return self
+
+    def to_json(self) -> str:
+        return json.dumps({name: getattr(self, name) for name in self.__slots__ if name != "group_id"})
+
+    @classmethod
+    def from_json(cls, group_id: int, data):
+        return cls(group_id, **json.loads(data))
+
+
+def _key(group_id: int) -> str:
+    return f"room_status:{group_id}"
+
+
+@releases_connection
+async def _load_from_db(group_id: int) -> RoomStatus:
+    # Holat Redis da bo'lmasa (masalan, Redis siz rejim yoki engine boshqa jarayonda): savol ma'lumotisiz
+    row = await Group.objects.filter(id=group_id).values("is_active", "time").afirst() or {}
+    return RoomStatus(group_id, is_active=row.get("is_active", False), time=row.get("time"))
+
+
+def watch(group_id: int):
+    """Shu jarayonda xona eventlarini oladigan consumer yoki engine paydo bo'ldi."""
+    _watchers[group_id] = _watchers.get(group_id, 0) + 1
+
+
+def unwatch(group_id: int):
+    count = _watchers.get(group_id, 0) - 1
+    if count > 0:
+        _watchers[group_id] = count
+        return
+    _watchers.pop(group_id, None)
+    forget_status(group_id)
+    forget_snapshot(group_id)
+
+
+def _remember(status: RoomStatus) -> RoomStatus:
+    if status.group_id in _watchers:
+        _statuses[status.group_id] = status
+    return status
+
+
+def apply(group_id: int, **fields) -> RoomStatus:
+    """Event dan kelgan o'zgarishni jarayondagi nusxaga qo'llaydi (DB va Redis siz)."""
+    status = _statuses.get(group_id) or RoomStatus(group_id)
+    return _remember(status.update(**fields))
+
+
+async def publish(group_id: int, **fields) -> RoomStatus:
+    """Engine tomonidan: o'zgarishni jarayonga va Redis ga yozadi."""
+    status = apply(group_id, **fields)
+    redis = get_redis()
+    if redis is not None:
+        await redis.set(_key(group_id), status.to_json(), ex=STATUS_TTL)
+    return status
+
+
+async def get_status(group_id: int) -> RoomStatus:
+    status = _statuses.get(group_id)
+    if status is not None:
+        return status
+    redis = get_redis()
+    if redis is not None:
+        data = await redis.get(_key(group_id))
+        if data:
+            return _remember(RoomStatus.from_json(group_id, data))
+    status = await _load_from_db(group_id)
+    # DB dan o'qilguncha event kelib nusxa yangilangan bo'lishi mumkin
+    return _statuses.get(group_id) or _remember(status)
+
+
+def forget_status(group_id: int):
+    _statuses.pop(group_id, None)
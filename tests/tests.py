@@ -1,3 +1,255 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from tests import engine, presence, protocol, routing, status
+from tests.models import User, Category, Group, Questions, Answer, UserAnswers, QuestionStat, Result
+
+TIMEOUT = 3
+
+
+def _with_user(app, user):
+    # JWTAuthMiddleware o'rniga: foydalanuvchi scope ga to'g'ridan-to'g'ri qo'yiladi
+    async def inject(scope, receive, send):
+        return await app({**scope, "user": user}, receive, send)
+    return inject
+
+
+async def _connect(user, room_code, subprotocols=None):
+    communicator = WebsocketCommunicator(
+        _with_user(URLRouter(routing.websocket_urlpatterns), user), f"/ws/test/{room_code}/",
+        subprotocols=subprotocols,
+    )
+    connected, _ = await communicator.connect(timeout=TIMEOUT)
+    assert connected
+    return communicator
+
+
+async def _receive(communicator, *types):
+    """Berilgan turdagi kadr kelguncha qolganlarini (presence, leaderboard ...) o'tkazib yuboradi."""
+    while True:
+        message = await communicator.receive_json_from(timeout=TIMEOUT)
+        if message["type"] in types:
+            return message
+
+
+async def _disconnect(*communicators):
+    for communicator in communicators:
+        await communicator.disconnect()
+    # presence va reyting kadrlari oraliq tugagach yuboriladi
+    await asyncio.sleep(0.2)
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ROOM_STATE_REDIS_URL="",
+    ANSWER_BUFFER_FLUSH_INTERVAL=0.05,
+    ANSWER_GRACE_PERIOD=0.1,
+    PRESENCE_BROADCAST_INTERVAL=0.05,
+    LEADERBOARD_BROADCAST_INTERVAL=0.05,
+)
+class RoomTestCase(TransactionTestCase):
+    """In-memory channel layer va Redis siz rejimda xona bo'yicha to'liq oqim."""
+
+    def setUp(self):
+        self.admin = User.objects.create(username="room_admin", is_admin=True, password="!")
+        self.student = User.objects.create(username="room_student", password="!")
+        category = Category.objects.create(name="Kategoriya")
+        self.group = Group.objects.create(name="Xona", admin=self.admin, code=f"T{self.admin.id}X", time=30)
+        self.questions = []
+        for i in range(2):
+            question = Questions.objects.create(
+                question=f"Savol {i}", level="LOW", created_by=self.admin, category=category,
+            )
+            question.group.add(self.group)
+            Answer.objects.bulk_create([
+                Answer(question=question, answer=f"Javob {j}", is_correct=(j == 0)) for j in range(3)
+            ])
+            self.questions.append(question)
+
+    async def _start(self, *students):
+        admin = await _connect(self.admin, self.group.code)
+        await admin.send_json_to({"action": "start_test"})
+        questions = [await _receive(student, "question") for student in students]
+        return admin, questions[0]["question"]
+
+    async def _submit_in_parallel(self, copies):
+        # Bitta talaba bir nechta tabdan bir vaqtda javob yuboradi
+        students = [await _connect(self.student, self.group.code) for _ in range(copies)]
+        admin, question = await self._start(*students)
+        frame = {"action": "submit_answer", "question_id": question["id"], "answer_id": question["answers"][0]["id"]}
+        await asyncio.gather(*(student.send_json_to(frame) for student in students))
+        replies = [await _receive(student, "answer_feedback", "error") for student in students]
+
+        await admin.send_json_to({"action": "finish_test"})
+        await _receive(students[0], "final_results")
+        await _disconnect(admin, *students)
+        return question, replies
+
+    async def _assert_single_answer(self, copies=5):
+        question, replies = await self._submit_in_parallel(copies)
+        feedback = [reply for reply in replies if reply["type"] == "answer_feedback"]
+        errors = [reply["error"] for reply in replies if reply["type"] == "error"]
+        self.assertEqual(len(feedback), 1)
+        self.assertEqual(len(errors), copies - 1)
+        for error in errors:
+            self.assertIn("allaqachon", error)
+
+        rows = await database_sync_to_async(list)(
+            UserAnswers.objects.filter(user=self.student, question_id=question["id"]).values("answer_id", "score")
+        )
+        self.assertEqual(rows, [{"answer_id": question["answers"][0]["id"], "score": feedback[0]["score"]}])
+        answered = await QuestionStat.objects.filter(group=self.group, question_id=question["id"]).values_list(
+            "answered_count", flat=True
+        ).afirst()
+        self.assertEqual(answered, 1)
+
+    @override_settings(ANSWER_WRITE_MODE="buffered")
+    async def test_parallel_submissions_buffered(self):
+        await self._assert_single_answer()
+
+    @override_settings(ANSWER_WRITE_MODE="immediate")
+    async def test_parallel_submissions_immediate(self):
+        await self._assert_single_answer()
+
+    async def test_engine_runs_questions_on_timer_and_finishes(self):
+        await database_sync_to_async(Group.objects.filter(id=self.group.id).update)(time=1)
+        student = await _connect(self.student, self.group.code)
+        admin, first = await self._start(student)
+        self.assertEqual(first["id"], self.questions[0].id)
+        await student.send_json_to(
+            {"action": "submit_answer", "question_id": first["id"], "answer_id": first["answers"][0]["id"]}
+        )
+        feedback = await _receive(student, "answer_feedback")
+        self.assertTrue(feedback["is_correct"])
+
+        # Admin hech narsa qilmaydi: ikkinchi savol va yakun taymer bo'yicha keladi
+        second = await _receive(student, "question")
+        self.assertEqual(second["question"]["id"], self.questions[1].id)
+        self.assertEqual(second["current_question_number"], 2)
+        final = await _receive(student, "final_results")
+        await _disconnect(admin, student)
+
+        scores = {row["user__username"]: row["score"] for row in final["results"]}
+        self.assertEqual(scores[self.student.username], feedback["score"])
+        self.assertNotIn(self.group.code, engine._engines)
+        self.assertFalse((await status.get_status(self.group.id)).is_active)
+
+        group = await Group.objects.aget(id=self.group.id)
+        self.assertFalse(group.is_active)
+        self.assertIsNotNone(group.end_time)
+        rows = await database_sync_to_async(dict)(
+            UserAnswers.objects.filter(user=self.student).values_list("question_id", "answer_id")
+        )
+        # Javob berilmagan ikkinchi savolga 0 ball yozilgan
+        self.assertEqual(rows[self.questions[1].id], None)
+        self.assertIsNotNone(rows[self.questions[0].id])
+        result = await Result.objects.aget(group=self.group, user=self.student)
+        self.assertEqual((result.score, result.rank), (feedback["score"], 1))
+
+    async def test_failed_start_does_not_keep_engine(self):
+        await database_sync_to_async(Group.objects.filter(id=self.group.id).update)(start_time=timezone.now())
+        admin = await _connect(self.admin, self.group.code)
+        await admin.send_json_to({"action": "start_test"})
+        error = await _receive(admin, "error")
+        await _disconnect(admin)
+
+        self.assertIn("allaqachon", error["error"])
+        self.assertNotIn(self.group.code, engine._engines)
+        self.assertNotIn(f"room_lease:{self.group.code}", engine._local_leases)
+
+    async def test_engine_error_is_reported_and_releases_lease(self):
+        admin = await _connect(self.admin, self.group.code)
+        with mock.patch.object(engine.RoomEngine, "_start", side_effect=RuntimeError("db down")):
+            await admin.send_json_to({"action": "start_test"})
+            error = await _receive(admin, "error")
+        await _disconnect(admin)
+
+        self.assertIn("bajarib bo'lmadi", error["error"])
+        self.assertNotIn(self.group.code, engine._engines)
+        self.assertNotIn(f"room_lease:{self.group.code}", engine._local_leases)
+
+    @override_settings(PRESENCE_BROADCAST_INTERVAL=30)
+    async def test_member_joining_before_membership_flush_gets_results(self):
+        admin = await _connect(self.admin, self.group.code)
+        await admin.send_json_to({"action": "start_test"})
+        await _receive(admin, "question")
+        # Talaba birinchi savoldan keyin ulanadi, a'zoligi hali GroupUsers ga yozilmagan
+        student = await _connect(self.student, self.group.code)
+        await admin.send_json_to({"action": "next_question"})
+        await _receive(student, "question")
+        await admin.send_json_to({"action": "finish_test"})
+        final = await _receive(student, "final_results")
+        for pending in list(presence._pending.values()):
+            pending.task.cancel()
+        await _disconnect(admin, student)
+
+        self.assertIn(self.student.username, [row["user__username"] for row in final["results"]])
+        rows = await database_sync_to_async(set)(
+            UserAnswers.objects.filter(user=self.student).values_list("question_id", flat=True)
+        )
+        self.assertEqual(rows, {q.id for q in self.questions})
+        group = await Group.objects.aget(id=self.group.id)
+        self.assertEqual(group.participant_count, 2)
+
+    async def test_reconnected_student_cannot_answer_twice(self):
+        student = await _connect(self.student, self.group.code)
+        admin, question = await self._start(student)
+        frame = {"action": "submit_answer", "question_id": question["id"], "answer_id": question["answers"][0]["id"]}
+        await student.send_json_to(frame)
+        feedback = await _receive(student, "answer_feedback")
+        await _disconnect(student)
+
+        # Yangi ulanishda answered_question_ids bo'sh: belgi resume dan tiklanadi
+        student = await _connect(self.student, self.group.code)
+        resume = await _receive(student, "resume")
+        self.assertEqual(resume["question"]["id"], question["id"])
+        self.assertTrue(resume["answered"])
+        self.assertEqual(resume["score"], feedback["score"])
+        await student.send_json_to(frame)
+        error = await _receive(student, "error")
+        await admin.send_json_to({"action": "finish_test"})
+        await _receive(student, "final_results")
+        await _disconnect(admin, student)
+
+        self.assertIn("allaqachon", error["error"])
+        count = await UserAnswers.objects.filter(user=self.student, question_id=question["id"]).acount()
+        self.assertEqual(count, 1)
+
+    async def test_answer_after_deadline_is_rejected(self):
+        student = await _connect(self.student, self.group.code)
+        admin, question = await self._start(student)
+        # Admin consumeri ham send_question ni qayta ishlab, holatni yangilab bo'lgan bo'lsin
+        await _receive(admin, "question")
+        # Boshqa jarayondagi engine savolni yopgan, question_closed eventi esa hali kelmagan
+        current = await status.get_status(self.group.id)
+        status.apply(self.group.id, started_at=current.started_at - current.time - 1)
+        await student.send_json_to(
+            {"action": "submit_answer", "question_id": question["id"], "answer_id": question["answers"][0]["id"]}
+        )
+        error = await _receive(student, "error")
+        await admin.send_json_to({"action": "finish_test"})
+        await _receive(student, "final_results")
+        await _disconnect(admin, student)
+
+        self.assertIn("vaqti tugagan", error["error"])
+        answer = await UserAnswers.objects.aget(user=self.student, question_id=question["id"])
+        self.assertEqual((answer.answer_id, answer.score), (None, 0))
+
+    async def test_malformed_msgpack_frame_gets_error_message(self):
+        student = await _connect(self.student, self.group.code, subprotocols=[protocol.MSGPACK])
+        await student.receive_from(timeout=TIMEOUT)
+        await student.send_to(bytes_data=b"\xc1")
+        frame = msgpack.unpackb(await student.receive_from(timeout=TIMEOUT))
+        await _disconnect(student)
+
+        self.assertEqual(frame["t"], protocol.MESSAGE_TYPES["error"])
+        self.assertIn("msgpack", frame["error"])